@@ -2,30 +2,64 @@
 
 from __future__ import annotations
 
+import atexit
 import base64
 import hashlib
 import io
 import json
 import os
 import random
+import threading
+import time
+import zipfile
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Response, jsonify, request, send_file
 from flask_cors import CORS
 from PIL import Image
-from ultralytics import YOLO
 from werkzeug.utils import secure_filename
 
+from batching import MicroBatcher
+from blob_store import AnnotatedImageStore
+from cache import DEFAULT_TTLS, CachedRepository, ReadThroughCache, parse_ttls
 from database import ResultRepository
-from mysql_database import get_mysql_repository, MYSQL_AVAILABLE
+from inference import ModelHolder, predict_batch, predict_tiled
+from inference_server import InferenceClient, parse_address
+from jobs import JobQueue, JobWorker
+from maintenance import Maintainer, RetentionPolicy
+from write_behind import WriteBehindQueue
+from mysql_database import CLEANLINESS_TABLES, get_mysql_repository, MYSQL_AVAILABLE
+from columnar import COLUMNAR_FORMATS, HISTORY_COLUMNS, INSPECTION_COLUMNS, PYARROW_AVAILABLE, columnar_stream
+from columnar import MIMETYPES as COLUMNAR_MIMETYPES
+from streaming import MIMETYPES, STREAM_FORMATS, encode_stream, gzip_stream
 
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg", "bmp"}
 
+# Micro-batching: concurrent single-image requests are merged into one
+# MODEL.predict call once BATCH_MAX_SIZE images are waiting or after
+# BATCH_MAX_WAIT_MS milliseconds, whichever comes first.
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT = float(os.getenv("BATCH_MAX_WAIT_MS", "20")) / 1000
+# Upper bound on images accepted by a single /api/classify/batch request
+BATCH_MAX_FILES = int(os.getenv("BATCH_MAX_FILES", "500"))
+# Upper bound on a request body and on the images it expands to after unzipping
+BATCH_MAX_BYTES = int(os.getenv("BATCH_MAX_MB", "1024")) * 1024 * 1024
+
+# Sliced inference for high-resolution drone frames. TILED_INFERENCE turns it
+# on by default; requests can also opt in with ``tiled=1``.
+TILED_INFERENCE = os.getenv("TILED_INFERENCE", "0") == "1"
+TILE_OPTIONS = {
+    "tile_size": int(os.getenv("TILE_SIZE", "640")),
+    "overlap": float(os.getenv("TILE_OVERLAP", "0.2")),
+    "batch_size": int(os.getenv("TILE_BATCH_SIZE", "8")),
+}
+
 app = Flask(__name__)
+app.config["MAX_CONTENT_LENGTH"] = BATCH_MAX_BYTES
 CORS(app)  # Enable CORS for all routes
 
 # Path to training images for sample display
@@ -46,6 +80,7 @@ DEFAULT_SETTINGS = {
     "threshold_good": 85,
     "threshold_warning": 75,
     "model_confidence": 0.85,
+    "inference_runtime": "torch",
 }
 
 # Simulated drone status
@@ -58,11 +93,65 @@ DRONE_STATUS = {
 }
 
 WEIGHTS_PATH = Path("best.pt")
-if not WEIGHTS_PATH.exists():
-    raise FileNotFoundError("未找到 best.pt,请将训练好的 YOLO-Seg 权重放到项目根目录。")
 
-MODEL = YOLO(str(WEIGHTS_PATH))
+
+def _inference_runtime() -> str:
+    """INFERENCE_RUNTIME wins over the ``inference_runtime`` key in settings.json."""
+    runtime = os.getenv("INFERENCE_RUNTIME")
+    if runtime:
+        return runtime
+    if SETTINGS_FILE.exists():
+        try:
+            with open(SETTINGS_FILE, "r") as f:
+                return json.load(f).get("inference_runtime", DEFAULT_SETTINGS["inference_runtime"])
+        except Exception:
+            pass
+    return DEFAULT_SETTINGS["inference_runtime"]
+
+
+# When INFERENCE_ADDRESS points at a running inference_server.py, this web
+# worker sends decoded images there and never loads the model itself.
+INFERENCE_ADDRESS = os.getenv("INFERENCE_ADDRESS")
+INFERENCE_CLIENT = InferenceClient(parse_address(INFERENCE_ADDRESS)) if INFERENCE_ADDRESS else None
+# The model is loaded in the background (MODEL_LOADING=background) or on the
+# first inference request (lazy), so a missing or slow best.pt never blocks
+# the dashboard, mirror-field and history endpoints.
+MODEL_HOLDER = None
+if INFERENCE_CLIENT is None:
+    MODEL_HOLDER = ModelHolder(
+        WEIGHTS_PATH,
+        _inference_runtime(),
+        warmup_runs=int(os.getenv("MODEL_WARMUP_RUNS", "1")),
+        warmup_size=int(os.getenv("MODEL_WARMUP_SIZE", "640")),
+    )
+    if os.getenv("MODEL_LOADING", "background") == "background":
+        MODEL_HOLDER.start()
 REPOSITORY = ResultRepository(Path("classification_results.db"))
+# Annotated PNGs, stored once per upload hash and served by /api/results/<hash>/annotated
+ANNOTATED_STORE = AnnotatedImageStore(Path(__file__).parent / "annotated_images")
+# Classify results are committed by a background writer (WRITE_BEHIND=0 writes
+# inline). See write_behind.py for the crash-loss window.
+WRITE_BEHIND = None
+if os.getenv("WRITE_BEHIND", "1") == "1":
+    WRITE_BEHIND = WriteBehindQueue(
+        REPOSITORY,
+        max_size=int(os.getenv("WRITE_BEHIND_MAX_SIZE", "1000")),
+        batch_size=int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "200")),
+        max_delay=float(os.getenv("WRITE_BEHIND_MAX_DELAY_MS", "200")) / 1000,
+        max_retries=int(os.getenv("WRITE_BEHIND_MAX_RETRIES", "5")),
+    )
+    WRITE_BEHIND.start()
+    atexit.register(WRITE_BEHIND.close)
+# Retention (RETENTION_*_DAYS), monthly archives and incremental vacuum;
+# MAINTENANCE_INTERVAL=0 disables the background thread.
+MAINTAINER = Maintainer(
+    REPOSITORY,
+    ANNOTATED_STORE,
+    RetentionPolicy.from_env(),
+    interval=float(os.getenv("MAINTENANCE_INTERVAL", "3600")),
+)
+if MAINTAINER.interval > 0:
+    MAINTAINER.start()
 
 # MySQL repository (optional - falls back to simulated data if not available)
 MYSQL_REPO = None
@@ -75,6 +164,19 @@ if MYSQL_AVAILABLE:
         else:
             print(f"✗ MySQL connection failed: {conn_test.get('error')}")
             MYSQL_REPO = None
+        if MYSQL_REPO and os.getenv("CACHE_ENABLED", "1") != "0":
+            # Read-through cache for the polled dashboard reads; CACHE_SHARED_PATH
+            # shares it (and its invalidations) across gunicorn workers.
+            shared_path = os.getenv("CACHE_SHARED_PATH")
+            MYSQL_REPO = CachedRepository(
+                MYSQL_REPO,
+                ReadThroughCache(
+                    max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+                    shared_path=Path(shared_path) if shared_path else None,
+                    wait_timeout=float(os.getenv("CACHE_WAIT_TIMEOUT", "10")),
+                ),
+                ttls={**DEFAULT_TTLS, **parse_ttls(os.getenv("CACHE_TTLS", ""))},
+            )
     except Exception as e:
         print(f"✗ MySQL not available: {e}")
         MYSQL_REPO = None
@@ -86,36 +188,63 @@ def _allowed_file(filename: str) -> bool:
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def _predict(image: Image.Image, conf: float = 0.25) -> Tuple[Dict, bytes]:
-    np_image = np.array(image)
-    results = MODEL.predict(np_image, conf=conf, save=False, verbose=False)
-    if not results:
-        return {"detections": []}, b""
-
-    result = results[0]
-    detections = []
-    names = result.names
-    boxes = getattr(result, "boxes", None)
-    if boxes is not None:
-        xywh = boxes.xywh.cpu().numpy()
-        cls = boxes.cls.cpu().numpy()
-        confs = boxes.conf.cpu().numpy()
-        for i in range(len(cls)):
-            center_x, center_y, _, _ = xywh[i]
-            target = names.get(int(cls[i]), str(int(cls[i])))
-            detections.append(
-                {
-                    "target": target,
-                    "center": [float(center_x), float(center_y)],
-                    "confidence": float(confs[i]),
-                }
-            )
+# The in-process model is shared by the batcher, batch requests and job workers,
+# and Ultralytics predictors are not thread-safe: run one forward pass at a time.
+MODEL_LOCK = threading.Lock()
+
+
+def _run_batch(images: List[np.ndarray], conf: float) -> List[Tuple[Dict, bytes]]:
+    if INFERENCE_CLIENT is not None:
+        return INFERENCE_CLIENT.predict(images, conf=conf)
+    model = MODEL_HOLDER.get()
+    with MODEL_LOCK:
+        return predict_batch(model, images, conf=conf)
+
+
+def _predict_many(items: List[Tuple[np.ndarray, float]]) -> List[Tuple[Dict, bytes]]:
+    """Batch handler: group queued images by confidence and predict each group at once."""
+    outputs: List[Tuple[Dict, bytes]] = [({"detections": []}, b"")] * len(items)
+    groups: Dict[float, List[int]] = {}
+    for idx, (_, conf) in enumerate(items):
+        groups.setdefault(conf, []).append(idx)
+    for conf, indices in groups.items():
+        for start in range(0, len(indices), BATCH_MAX_SIZE):
+            chunk = indices[start:start + BATCH_MAX_SIZE]
+            results = _run_batch([items[i][0] for i in chunk], conf)
+            for i, result in zip(chunk, results):
+                outputs[i] = result
+    return outputs
+
+
+BATCHER = MicroBatcher(_predict_many, max_batch_size=BATCH_MAX_SIZE, max_wait=BATCH_MAX_WAIT)
+
+
+def _predict_tiled_many(images: List[np.ndarray], conf: float = 0.25) -> List[Tuple[Dict, bytes]]:
+    if INFERENCE_CLIENT is not None:
+        return INFERENCE_CLIENT.predict(images, conf=conf, tiled=True)
+    model = MODEL_HOLDER.get()
+    outputs = []
+    for image in images:
+        # Per image, so other requests can get a turn between large frames
+        with MODEL_LOCK:
+            outputs.append(predict_tiled(model, image, conf=conf, **TILE_OPTIONS))
+    return outputs
+
 
-    annotated = result.plot()
-    buffer = io.BytesIO()
-    Image.fromarray(annotated).save(buffer, format="PNG")
-    annotated_bytes = buffer.getvalue()
-    return {"detections": detections}, annotated_bytes
+def _wants_tiled() -> bool:
+    value = request.values.get("tiled")
+    if value is None:
+        return TILED_INFERENCE
+    return value.lower() in {"1", "true", "yes"}
+
+
+def _predict(image: Image.Image, conf: float = 0.25, tiled: bool = False) -> Tuple[Dict, bytes]:
+    if tiled:
+        return _predict_tiled_many([np.array(image)], conf=conf)[0]
+    if INFERENCE_CLIENT is not None:
+        # The inference server batches across all web workers itself
+        return INFERENCE_CLIENT.predict([np.array(image)], conf=conf)[0]
+    return BATCHER.submit((np.array(image), conf))
 
 
 @app.route("/api/health", methods=["GET"])
@@ -123,8 +252,69 @@ def health() -> Tuple[str, int]:
     return jsonify({"status": "ok"}), 200
 
 
-def _rows_to_detections(rows: List) -> Tuple[List[Dict[str, object]], str]:  # type: ignore[type-arg]
-    detections = [
+@app.route("/api/ready", methods=["GET"])
+def ready() -> Tuple[str, int]:
+    """Report whether inference requests can be served right now."""
+    if INFERENCE_CLIENT is not None:
+        try:
+            model = {"state": "ready", "server": INFERENCE_CLIENT.ping()}
+        except Exception as exc:  # noqa: BLE001
+            model = {"state": "unavailable", "error": str(exc)}
+    else:
+        model = MODEL_HOLDER.status()
+    is_ready = model["state"] == "ready"
+    return jsonify({"ready": is_ready, "model": model}), 200 if is_ready else 503
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Internal queue depths and counters of this worker process."""
+    return jsonify({
+        "pid": os.getpid(),
+        "write_behind": WRITE_BEHIND.metrics() if WRITE_BEHIND else None,
+        "mysql_pool": MYSQL_REPO.pool_stats() if MYSQL_REPO else None,
+        "cache": MYSQL_REPO.cache.metrics() if isinstance(MYSQL_REPO, CachedRepository) else None,
+    })
+
+
+@app.route("/api/cache/invalidate", methods=["POST"])
+def invalidate_cache():
+    """Drop cached MySQL reads, e.g. after importing data outside the API.
+
+    Body ``{"methods": [...]}`` limits it to those repository methods.
+    """
+    if not isinstance(MYSQL_REPO, CachedRepository):
+        return jsonify({"success": False, "error": "Cache not enabled"}), 503
+    body = request.get_json(silent=True) or {}
+    methods = body.get("methods") if isinstance(body, dict) else body
+    if methods is not None and not (isinstance(methods, list) and all(isinstance(m, str) for m in methods)):
+        return jsonify({"success": False, "error": "methods must be a list of method names"}), 400
+    try:
+        MYSQL_REPO.invalidate(methods)
+    except ValueError as exc:
+        return jsonify({"success": False, "error": str(exc)}), 400
+    return jsonify({"success": True, "invalidated": methods or "all"})
+
+
+@app.route("/api/maintenance", methods=["GET"])
+def maintenance_status():
+    """Database size, retention policy and the last maintenance cycle of this worker."""
+    policy = MAINTAINER.policy
+    return jsonify({
+        "storage": REPOSITORY.storage_stats(),
+        "policy": {
+            "annotated_days": policy.annotated_days,
+            "history_days": policy.history_days,
+            "archive_dir": str(policy.archive_dir),
+            "vacuum_pages": policy.vacuum_pages,
+        },
+        "interval": MAINTAINER.interval,
+        "last_run": MAINTAINER.last_run,
+    })
+
+
+def _rows_to_detections(rows: List) -> List[Dict[str, object]]:  # type: ignore[type-arg]
+    return [
         {
             "target": row["target"],
             "center": [row["center_x"], row["center_y"]],
@@ -133,8 +323,66 @@ def _rows_to_detections(rows: List) -> Tuple[List[Dict[str, object]], str]:  # t
         for row in rows
         if row["target"] != "none"
     ]
-    annotated_b64 = rows[0]["annotated_image"] if rows and rows[0]["annotated_image"] else ""
-    return detections, annotated_b64
+
+
+def _annotated_url(file_hash: str) -> str:
+    return f"/api/results/{file_hash}/annotated"
+
+
+def _lookup_cached(filename: str, file_hash: str) -> Optional[Dict[str, object]]:
+    queued = WRITE_BEHIND.pending(file_hash) if WRITE_BEHIND else None
+    if queued is not None:
+        return {
+            "filename": filename,
+            "file_hash": file_hash,
+            "detections": list(queued[2]),
+            "annotated_url": _annotated_url(file_hash) if ANNOTATED_STORE.exists(file_hash) else None,
+            "cached": True,
+        }
+    existing_rows = REPOSITORY.get_results_by_hash(file_hash)
+    if not existing_rows:
+        return None
+    return {
+        "filename": filename,
+        "file_hash": file_hash,
+        "detections": _rows_to_detections(existing_rows),
+        # The PNG may have been removed by the retention policy
+        "annotated_url": _annotated_url(file_hash)
+        if ANNOTATED_STORE.exists(file_hash) or REPOSITORY.has_legacy_annotated(file_hash)
+        else None,
+        "cached": True,
+    }
+
+
+def _prediction_result(
+    filename: str, file_hash: str, data: Dict, annotated_bytes: bytes
+) -> Dict[str, object]:
+    """Save the annotated image and build the response; rows are written by the caller."""
+    if annotated_bytes:
+        ANNOTATED_STORE.put(file_hash, annotated_bytes)
+    return {
+        "filename": filename,
+        "file_hash": file_hash,
+        "detections": data.get("detections", []),
+        "annotated_url": _annotated_url(file_hash) if annotated_bytes else None,
+        "cached": False,
+    }
+
+
+def _persist_results(items: List[Tuple[str, str, List[Dict[str, object]]]]) -> None:
+    """Queue ``(filename, file_hash, detections)`` for the background writer, or commit them now."""
+    if WRITE_BEHIND is not None:
+        WRITE_BEHIND.submit_many(items)
+    else:
+        REPOSITORY.insert_batch(items)
+
+
+def _store_prediction(
+    filename: str, file_hash: str, data: Dict, annotated_bytes: bytes
+) -> Dict[str, object]:
+    result = _prediction_result(filename, file_hash, data, annotated_bytes)
+    _persist_results([(filename, file_hash, result["detections"])])
+    return result
 
 
 @app.route("/api/classify", methods=["POST"])
@@ -152,59 +400,203 @@ def classify():
     try:
         image_bytes = file.read()
         file_hash = hashlib.md5(image_bytes).hexdigest()
-        existing_rows = REPOSITORY.get_results_by_hash(file_hash)
-        if existing_rows:
-            detections, annotated_b64 = _rows_to_detections(existing_rows)
-            return jsonify(
-                {
-                    "filename": filename,
-                    "detections": detections,
-                    "annotated_image": annotated_b64,
-                    "cached": True,
-                }
-            )
+        cached = _lookup_cached(filename, file_hash)
+        if cached:
+            return jsonify(cached)
 
         image = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        data, annotated_bytes = _predict(image)
-        detections = data.get("detections", [])
-        annotated_b64 = (
-            base64.b64encode(annotated_bytes).decode("utf-8") if annotated_bytes else ""
-        )
+        data, annotated_bytes = _predict(image, tiled=_wants_tiled())
+        return jsonify(_store_prediction(filename, file_hash, data, annotated_bytes))
+    except Exception as exc:  # noqa: BLE001
+        return jsonify({"error": f"推理失败: {exc}"}), 500
 
-        if not detections:
-            REPOSITORY.insert_result(
-                filename,
-                "none",
-                -1.0,
-                -1.0,
-                0.0,
-                file_hash,
-                annotated_b64,
-            )
+
+def _collect_batch_uploads() -> List[Tuple[str, bytes]]:
+    """Gather (filename, bytes) pairs from multipart ``files`` fields and zip archives.
+
+    Raises ValueError once the request holds more than ``BATCH_MAX_FILES``
+    images or ``BATCH_MAX_BYTES`` of them; zip members are checked against
+    both limits before anything is decompressed.
+    """
+    uploads: List[Tuple[str, bytes]] = []
+    total_bytes = 0
+    for file in request.files.getlist("files") + request.files.getlist("file"):
+        if not file.filename:
+            continue
+        if file.filename.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(file.read())) as archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not info.is_dir() and _allowed_file(info.filename)
+                ]
+                if len(uploads) + len(members) > BATCH_MAX_FILES:
+                    raise ValueError(f"单次最多上传 {BATCH_MAX_FILES} 张图片")
+                total_bytes += sum(info.file_size for info in members)
+                if total_bytes > BATCH_MAX_BYTES:
+                    raise ValueError(f"解压后的图片总大小超过 {BATCH_MAX_BYTES // (1024 * 1024)} MB")
+                for info in members:
+                    uploads.append((Path(info.filename).name, archive.read(info)))
         else:
-            for det in detections:
-                center = det.get("center", [0.0, 0.0])
-                REPOSITORY.insert_result(
-                    filename,
-                    det.get("target", "unknown"),
-                    center[0],
-                    center[1],
-                    det.get("confidence", 0.0),
-                    file_hash,
-                    annotated_b64,
-                )
-
-        return jsonify(
-            {
-                "filename": filename,
-                "detections": detections,
-                "annotated_image": annotated_b64,
-                "cached": False,
-            }
-        )
+            if len(uploads) >= BATCH_MAX_FILES:
+                raise ValueError(f"单次最多上传 {BATCH_MAX_FILES} 张图片")
+            uploads.append((file.filename, file.read()))
+    return uploads
+
+
+def _classify_uploads(
+    uploads: List[Tuple[str, bytes]], tiled: bool = False
+) -> List[Dict[str, object]]:
+    """Classify ``(filename, bytes)`` uploads, sending every uncached image through batched inference.
+
+    Images are decoded ``BATCH_MAX_SIZE`` at a time, right before they are
+    predicted, so only one chunk of pixel arrays is held at once.
+    Per-file problems are reported as ``{"filename", "error"}`` entries; an
+    inference failure raises so the caller can decide whether to retry.
+    """
+    results: List[Optional[Dict[str, object]]] = [None] * len(uploads)
+    pending: List[Tuple[int, str, str]] = []
+    duplicates: List[Tuple[int, str, int]] = []
+    seen_hashes: Dict[str, int] = {}
+    for idx, (raw_name, image_bytes) in enumerate(uploads):
+        filename = secure_filename(raw_name)
+        if not _allowed_file(raw_name):
+            results[idx] = {"filename": filename, "error": "只支持 jpg/jpeg/png 格式"}
+            continue
+        file_hash = hashlib.md5(image_bytes).hexdigest()
+        if file_hash in seen_hashes:
+            duplicates.append((idx, filename, seen_hashes[file_hash]))
+            continue
+        seen_hashes[file_hash] = idx
+        cached = _lookup_cached(filename, file_hash)
+        if cached:
+            results[idx] = cached
+            continue
+        pending.append((idx, filename, file_hash))
+
+    predicted: List[int] = []
+    for start in range(0, len(pending), BATCH_MAX_SIZE):
+        chunk: List[Tuple[int, str, str]] = []
+        images: List[np.ndarray] = []
+        for idx, filename, file_hash in pending[start:start + BATCH_MAX_SIZE]:
+            try:
+                image = Image.open(io.BytesIO(uploads[idx][1])).convert("RGB")
+            except Exception as exc:  # noqa: BLE001
+                results[idx] = {"filename": filename, "error": f"图片解析失败: {exc}"}
+                continue
+            chunk.append((idx, filename, file_hash))
+            images.append(np.array(image))
+        if not images:
+            continue
+        if tiled:
+            predictions = _predict_tiled_many(images)
+        else:
+            predictions = _predict_many([(image, 0.25) for image in images])
+        del images
+        for (idx, filename, file_hash), (data, annotated_bytes) in zip(chunk, predictions):
+            results[idx] = _prediction_result(filename, file_hash, data, annotated_bytes)
+            predicted.append(idx)
+    # One transaction for the whole batch instead of one commit per detection
+    _persist_results([
+        (results[idx]["filename"], results[idx]["file_hash"], results[idx]["detections"])
+        for idx in predicted
+    ])
+    # Identical images uploaded twice in one batch reuse the first result
+    for idx, filename, first_idx in duplicates:
+        first = results[first_idx] or {}
+        results[idx] = {**first, "filename": filename, "cached": "error" not in first}
+    return [item or {} for item in results]
+
+
+@app.route("/api/classify/batch", methods=["POST"])
+def classify_batch():
+    """Classify many images (multipart ``files`` and/or zip archives) in batched forward passes."""
+    try:
+        uploads = _collect_batch_uploads()
+    except zipfile.BadZipFile:
+        return jsonify({"error": "无法解析 zip 压缩包"}), 400
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 413
+    if not uploads:
+        return jsonify({"error": "缺少文件字段 files"}), 400
+
+    try:
+        results = _classify_uploads(uploads, tiled=_wants_tiled())
     except Exception as exc:  # noqa: BLE001
         return jsonify({"error": f"推理失败: {exc}"}), 500
 
+    failed = sum(1 for item in results if "error" in item)
+    return jsonify({"results": results, "total": len(results), "failed": failed})
+
+
+def _run_job_batch(uploads: List[Tuple[str, bytes]]) -> List[Dict[str, object]]:
+    return _classify_uploads(uploads, tiled=TILED_INFERENCE)
+
+
+JOB_QUEUE = JobQueue(Path("inference_jobs.db"))
+JOB_WORKERS = [
+    JobWorker(JOB_QUEUE, _run_job_batch, batch_size=BATCH_MAX_SIZE)
+    for _ in range(int(os.getenv("JOB_WORKERS", "1")))
+]
+for _worker in JOB_WORKERS:
+    _worker.start()
+
+
+@app.route("/api/jobs", methods=["POST"])
+def create_job():
+    """Queue images for asynchronous classification and return the job id immediately."""
+    try:
+        uploads = _collect_batch_uploads()
+    except zipfile.BadZipFile:
+        return jsonify({"error": "无法解析 zip 压缩包"}), 400
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 413
+    if not uploads:
+        return jsonify({"error": "缺少文件字段 files"}), 400
+
+    job_id = JOB_QUEUE.create_job(uploads)
+    for worker in JOB_WORKERS:
+        worker.notify()
+    return jsonify({"job_id": job_id, "status": "queued", "total": len(uploads)}), 202
+
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id: str):
+    """Report progress and per-image results of an asynchronous job."""
+    job = JOB_QUEUE.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job)
+
+
+def _annotated_cache_control(path: Path) -> str:
+    """Immutable forever, unless the retention policy will prune the PNG."""
+    days = MAINTAINER.policy.annotated_days
+    if days <= 0:
+        return "public, max-age=31536000, immutable"
+    # Clients must not keep serving an image the server has deleted
+    remaining = path.stat().st_mtime + days * 86400 - time.time()
+    return f"public, max-age={max(0, int(remaining))}"
+
+
+@app.route("/api/results/<file_hash>/annotated", methods=["GET"])
+def get_annotated_image(file_hash: str):
+    """Serve the annotated PNG for an upload hash, cacheable until it is pruned."""
+    if not ANNOTATED_STORE.is_valid_hash(file_hash):
+        return jsonify({"error": "Invalid hash"}), 400
+
+    path = ANNOTATED_STORE.get_path(file_hash)
+    if path is None:
+        # Rows written before the blob store keep a base64 copy inline; move it over once
+        legacy_b64 = REPOSITORY.get_legacy_annotated(file_hash)
+        if not legacy_b64:
+            return jsonify({"error": "Annotated image not found"}), 404
+        path = ANNOTATED_STORE.put(file_hash, base64.b64decode(legacy_b64))
+        REPOSITORY.clear_legacy_annotated(file_hash)
+
+    response = send_file(path, mimetype="image/png", etag=file_hash, conditional=True)
+    response.headers["Cache-Control"] = _annotated_cache_control(path)
+    return response
+
 
 @app.route("/api/history", methods=["GET"])
 def history():
@@ -214,7 +606,12 @@ def history():
         limit = 50
     limit = max(1, min(200, limit))
     search = request.args.get("search")
-    rows = REPOSITORY.fetch_results(limit=limit, search=search)
+    try:
+        rows, next_cursor = REPOSITORY.fetch_page(
+            limit=limit, search=search, cursor=request.args.get("cursor") or None
+        )
+    except ValueError as exc:
+        return jsonify({"error": str(exc)}), 400
     results = [
         {
             "time": row["created_at"],
@@ -226,17 +623,15 @@ def history():
         }
         for row in rows
     ]
-    return jsonify({"results": results})
+    return jsonify({"results": results, "next_cursor": next_cursor})
 
 
-@app.route("/api/history/export", methods=["GET"])
-def export_history():
-    """Export all detection history without limit (for Excel export)."""
-    search = request.args.get("search")
-    # Fetch all results without limit
-    rows = REPOSITORY.fetch_results(limit=10000, search=search)
-    results = [
-        {
+HISTORY_EXPORT_FIELDS = ["id", "time", "filename", "target", "center_x", "center_y", "confidence"]
+
+
+def _history_records(search: Optional[str]):
+    for idx, row in enumerate(REPOSITORY.iter_results(search=search)):
+        yield {
             "id": idx + 1,
             "time": row["created_at"],
             "filename": row["filename"],
@@ -245,9 +640,55 @@ def export_history():
             "center_y": row["center_y"],
             "confidence": row["confidence"],
         }
-        for idx, row in enumerate(rows)
-    ]
-    return jsonify({"results": results, "total": len(results)})
+
+
+def _stream_response(chunks, fmt: str, download_name: Optional[str] = None) -> Response:
+    """Wrap text chunks in a streamed response, gzipped when the client accepts it."""
+    headers = {"X-Accel-Buffering": "no", "Vary": "Accept-Encoding"}
+    if download_name:
+        headers["Content-Disposition"] = f"attachment; filename={download_name}"
+    body = (chunk.encode("utf-8") for chunk in chunks)
+    if "gzip" in request.headers.get("Accept-Encoding", ""):
+        body = gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, mimetype=MIMETYPES[fmt], headers=headers)
+
+
+def _columnar_response(records, columns: Dict[str, str], fmt: str, download_name: str) -> Response:
+    """Stream Parquet/Arrow record batches; already compressed, so never gzipped."""
+    if not PYARROW_AVAILABLE:
+        return jsonify({"error": "pyarrow is not installed on the server"}), 501
+    headers = {
+        "X-Accel-Buffering": "no",
+        "Content-Disposition": f"attachment; filename={download_name}",
+    }
+    return Response(
+        columnar_stream(records, columns, fmt), mimetype=COLUMNAR_MIMETYPES[fmt], headers=headers
+    )
+
+
+EXPORT_FORMATS = STREAM_FORMATS + COLUMNAR_FORMATS
+
+
+def _export_format() -> Tuple[str, Optional[Tuple[Response, int]]]:
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in EXPORT_FORMATS:
+        return fmt, (jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400)
+    return fmt, None
+
+
+@app.route("/api/history/export", methods=["GET"])
+def export_history():
+    """Stream the full detection history as JSON (default), NDJSON, CSV, Parquet or Arrow."""
+    search = request.args.get("search")
+    fmt, error = _export_format()
+    if error:
+        return error
+    if fmt in COLUMNAR_FORMATS:
+        return _columnar_response(_history_records(search), HISTORY_COLUMNS, fmt, f"detection_history.{fmt}")
+    chunks = encode_stream(_history_records(search), fmt, HISTORY_EXPORT_FIELDS)
+    download_name = None if fmt == "json" else f"detection_history.{fmt}"
+    return _stream_response(chunks, fmt, download_name)
 
 
 # ============== NEW API ENDPOINTS ==============
@@ -430,9 +871,35 @@ def get_zone_stats():
 
 @app.route("/api/cleanliness/history", methods=["GET"])
 def get_cleanliness_history():
-    """Get cleanliness history for charts."""
-    days = int(request.args.get("days", 30))
+    """Get cleanliness history for charts.
+
+    From MySQL the series comes from the cleanliness rollups: ``zone`` (A, B,
+    ... or "A区") selects a zone instead of the whole field and
+    ``granularity=hour`` returns hourly points. Percentages, like the dashboard.
+    """
+    days = max(1, min(request.args.get("days", 30, type=int), 3660))
 
+    if MYSQL_REPO:
+        granularity = request.args.get("granularity", "day")
+        if granularity not in CLEANLINESS_TABLES:
+            return jsonify({"error": "granularity must be day or hour"}), 400
+        zone = (request.args.get("zone") or "").replace("区", "").upper() or None
+        rows = MYSQL_REPO.get_cleanliness_history(days=days, zone=zone, granularity=granularity)
+        label = "%m-%d" if granularity == "day" else "%m-%d %H:00"
+        history = [
+            {
+                "date": datetime.fromisoformat(str(row["bucket"])).strftime(label),
+                "bucket": row["bucket"],
+                "avg": round(float(row["avg_cleanliness"]) * 100, 1),
+                "min": round(float(row["min_cleanliness"]) * 100, 1),
+                "max": round(float(row["max_cleanliness"]) * 100, 1),
+                "count": row["count"],
+            }
+            for row in rows
+        ]
+        return jsonify({"history": history, "zone": zone, "granularity": granularity})
+
+    # Fallback to simulated data
     history = []
     base_date = datetime.now()
     for i in range(days, 0, -4):
@@ -692,20 +1159,73 @@ def get_db_status():
     })
 
 
+def _listing_format() -> Tuple[str, Optional[Tuple[Response, int]]]:
+    fmt = request.args.get("format", "json").lower()
+    if fmt not in STREAM_FORMATS:
+        return fmt, (jsonify({"error": f"format must be one of {', '.join(STREAM_FORMATS)}"}), 400)
+    return fmt, None
+
+
+def _listing_chunks(records, fmt: str, key: str, fieldnames: List[str]):
+    """JSON keeps the ``{"success", <key>, "total"}`` shape of the old responses."""
+    return encode_stream(records, fmt, fieldnames, key=key, head={"success": True})
+
+
+def _listing_response(records, fmt: str, key: str, fieldnames: List[str]) -> Response:
+    """Stream a MySQL listing."""
+    chunks = _listing_chunks(records, fmt, key, fieldnames)
+    return _stream_response(chunks, fmt, None if fmt == "json" else f"{key}.{fmt}")
+
+
+HELIOSTAT_FIELDS = ["id", "y_coord", "x_coord", "elevation", "ring", "column_num", "zone"]
+
+
 @app.route("/api/heliostats", methods=["GET"])
 def get_heliostats():
-    """Get all heliostat data."""
+    """Get all heliostat data as a streamed JSON (default), NDJSON or CSV listing."""
     if MYSQL_REPO:
         limit = request.args.get("limit", type=int)
-        heliostats = MYSQL_REPO.get_all_heliostats(limit=limit)
+        fmt, error = _listing_format()
+        if error:
+            return error
+        if isinstance(MYSQL_REPO, CachedRepository):
+            # Polled by every dashboard; heliostat_info only changes on a re-import
+            def render() -> str:
+                heliostats = MYSQL_REPO.iter_heliostats(limit=limit)
+                return "".join(_listing_chunks(heliostats, fmt, "heliostats", HELIOSTAT_FIELDS))
+
+            body = MYSQL_REPO.cached_body("heliostat_listing", f"{fmt}:{limit}", render)
+            return _stream_response([body], fmt, None if fmt == "json" else f"heliostats.{fmt}")
+        heliostats = MYSQL_REPO.iter_heliostats(limit=limit)
+        return _listing_response(heliostats, fmt, "heliostats", HELIOSTAT_FIELDS)
+    return jsonify({"success": False, "error": "MySQL not available"}), 503
+
+
+@app.route("/api/heliostats/state", methods=["GET"])
+def get_heliostat_states():
+    """Get the latest inspection of every heliostat (optionally one zone) for map colouring."""
+    if MYSQL_REPO:
+        zone = request.args.get("zone")
+        states = MYSQL_REPO.get_latest_states(zone=zone.upper() if zone else None)
         return jsonify({
             "success": True,
-            "total": len(heliostats),
-            "heliostats": heliostats,
+            "total": len(states),
+            "states": states,
         })
     return jsonify({"success": False, "error": "MySQL not available"}), 503
 
 
+@app.route("/api/heliostats/<int:heliostat_id>/state", methods=["GET"])
+def get_heliostat_state(heliostat_id: int):
+    """Get the latest inspection of one heliostat."""
+    if MYSQL_REPO:
+        state = MYSQL_REPO.get_latest_state(heliostat_id)
+        if state is None:
+            return jsonify({"success": False, "error": "No inspection for this heliostat"}), 404
+        return jsonify({"success": True, "state": state})
+    return jsonify({"success": False, "error": "MySQL not available"}), 503
+
+
 @app.route("/api/heliostats/zone/<zone>", methods=["GET"])
 def get_heliostats_by_zone(zone: str):
     """Get heliostats by zone."""
@@ -753,18 +1273,139 @@ def get_flight_detail(flight_id: int):
 
 @app.route("/api/inspections", methods=["GET"])
 def get_inspections():
-    """Get inspection records."""
+    """Get the newest inspection records (with zone) as a streamed JSON, NDJSON or CSV listing.
+
+    ``limit=0`` streams the whole table, newest first.
+    """
     if MYSQL_REPO:
         limit = request.args.get("limit", 100, type=int)
-        inspections = MYSQL_REPO.get_inspection_records(limit=limit)
-        return jsonify({
-            "success": True,
-            "total": len(inspections),
-            "inspections": inspections,
-        })
+        fmt, error = _listing_format()
+        if error:
+            return error
+        inspections = MYSQL_REPO.iter_inspection_records(limit=limit or None, newest_first=True)
+        return _listing_response(inspections, fmt, "inspections", list(INSPECTION_COLUMNS))
     return jsonify({"success": False, "error": "MySQL not available"}), 503
 
 
+@app.route("/api/inspections/export", methods=["GET"])
+def export_inspections():
+    """Stream all inspection records (with zone) in any export format."""
+    if not MYSQL_REPO:
+        return jsonify({"success": False, "error": "MySQL not available"}), 503
+    fmt, error = _export_format()
+    if error:
+        return error
+    records = MYSQL_REPO.iter_inspection_records()
+    if fmt in COLUMNAR_FORMATS:
+        return _columnar_response(records, INSPECTION_COLUMNS, fmt, f"inspection_records.{fmt}")
+    chunks = encode_stream(records, fmt, list(INSPECTION_COLUMNS), key="inspections")
+    download_name = None if fmt == "json" else f"inspection_records.{fmt}"
+    return _stream_response(chunks, fmt, download_name)
+
+
+BULK_MAX_ROWS = int(os.getenv("BULK_MAX_ROWS", "50000"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+
+
+def _optional(value, cast):
+    return None if value is None or value == "" else cast(value)
+
+
+def _parse_inspection(row: Dict) -> Dict:
+    """Validate one bulk row; raises ValueError with the offending field."""
+    if not isinstance(row, dict):
+        raise ValueError("row must be an object")
+    try:
+        record = {
+            "id": _optional(row.get("id"), int),
+            "heliostat_id": int(row["heliostat_id"]),
+            "image_path": _optional(row.get("image_path"), str),
+            "cleanliness": _optional(row.get("cleanliness"), float),
+            "confidence": _optional(row.get("confidence"), float),
+            "flight_id": _optional(row.get("flight_id"), int),
+        }
+    except KeyError:
+        raise ValueError("heliostat_id is required")
+    except (TypeError, ValueError) as exc:
+        raise ValueError(f"invalid value: {exc}")
+    for field in ("cleanliness", "confidence"):
+        if record[field] is not None and not 0 <= record[field] <= 1:
+            raise ValueError(f"{field} must be between 0 and 1")
+    timestamp = row.get("timestamp")
+    try:
+        record["timestamp"] = (datetime.fromisoformat(timestamp) if timestamp else datetime.now()).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"timestamp is not ISO 8601: {timestamp!r}")
+    return record
+
+
+@app.route("/api/inspections/bulk", methods=["POST"])
+def bulk_insert_inspections():
+    """Insert many inspection records at once.
+
+    Body: ``{"inspections": [{"heliostat_id", "cleanliness", "confidence",
+    "timestamp", "flight_id", "image_path"}, ...]}`` (or the bare list).
+    All rows are validated before anything is written.
+    """
+    if not MYSQL_REPO:
+        return jsonify({"success": False, "error": "MySQL not available"}), 503
+    data = request.get_json(silent=True)
+    rows = data.get("inspections") if isinstance(data, dict) else data
+    if not isinstance(rows, list) or not rows:
+        return jsonify({"success": False, "error": "Expected a non-empty list of inspections"}), 400
+    if len(rows) > BULK_MAX_ROWS:
+        return jsonify({"success": False, "error": f"At most {BULK_MAX_ROWS} rows per request"}), 413
+    records = []
+    for idx, row in enumerate(rows):
+        try:
+            records.append(_parse_inspection(row))
+        except ValueError as exc:
+            return jsonify({"success": False, "error": f"Row {idx}: {exc}"}), 400
+    result = MYSQL_REPO.bulk_insert_inspections(records, chunk_size=BULK_CHUNK_SIZE)
+    if "error" in result:
+        return jsonify({"success": False, **result}), 500
+    return jsonify({"success": True, **result})
+
+
+BATCH_MAX_HELIOSTATS = 500
+
+
+@app.route("/api/inspections/heliostats", methods=["GET", "POST"])
+def get_inspections_for_heliostats():
+    """Get inspection history for several heliostats in one query.
+
+    GET ``?ids=1,2,3&limit=10`` or POST ``{"ids": [1, 2, 3], "limit": 10}``;
+    results are keyed by heliostat id.
+    """
+    if not MYSQL_REPO:
+        return jsonify({"success": False, "error": "MySQL not available"}), 503
+    if request.method == "POST":
+        data = request.get_json(silent=True) or {}
+        ids, limit = data.get("ids"), data.get("limit", 10)
+    else:
+        ids = [part for part in request.args.get("ids", "").split(",") if part.strip()]
+        limit = request.args.get("limit", 10)
+    try:
+        if not isinstance(ids, list):
+            raise TypeError
+        ids = [int(i) for i in ids]
+        limit = max(1, min(int(limit), 100))
+    except (TypeError, ValueError):
+        return jsonify({"success": False, "error": "ids must be a list of integers and limit an integer"}), 400
+    if not ids:
+        return jsonify({"success": False, "error": "No heliostat ids provided"}), 400
+    if len(ids) > BATCH_MAX_HELIOSTATS:
+        return jsonify({"success": False, "error": f"At most {BATCH_MAX_HELIOSTATS} ids per request"}), 400
+    grouped = MYSQL_REPO.get_inspections_by_heliostats(ids, limit=limit)
+    if grouped is None:
+        return jsonify({"success": False, "error": "Failed to query inspections"}), 500
+    return jsonify({
+        "success": True,
+        "limit": limit,
+        "inspections": {str(heliostat_id): rows for heliostat_id, rows in grouped.items()},
+    })
+
+
 @app.route("/api/inspections/heliostat/<int:heliostat_id>", methods=["GET"])
 def get_heliostat_inspections(heliostat_id: int):
     """Get inspection history for a specific heliostat."""
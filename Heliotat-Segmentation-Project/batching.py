@@ -0,0 +1,82 @@
+"""服务端微批处理：把并发的单张推理请求合并成一次批量调用。"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+
+class MicroBatcher:
+    """Collect concurrent submissions and hand them to ``handler`` in batches.
+
+    A batch is flushed as soon as ``max_batch_size`` items are waiting or
+    ``max_wait`` seconds have passed since the first item of the batch
+    arrived. ``handler`` receives the list of items and must return one
+    result per item, in the same order. With ``workers > 1`` several batches
+    may be in flight at once, e.g. one per model replica.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], List[Any]],
+        max_batch_size: int = 8,
+        max_wait: float = 0.02,
+        name: str = "micro-batcher",
+        workers: int = 1,
+    ):
+        self.handler = handler
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait)
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        # Only one thread fills a batch at a time so items are not split
+        # across half-empty batches; handlers still run concurrently.
+        self._collect_lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """Queue ``item`` and block until its batch has been processed."""
+        return self.submit_async(item).result(timeout=timeout)
+
+    def submit_async(self, item: Any) -> Future:
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def _collect(self) -> List[Tuple[Any, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            with self._collect_lock:
+                batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.handler(items)
+                if len(results) != len(items):
+                    raise RuntimeError(
+                        f"batch handler returned {len(results)} results for {len(items)} items"
+                    )
+            except Exception as exc:  # noqa: BLE001
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
@@ -0,0 +1,93 @@
+"""SQLite 写入/读取吞吐基准：对比“每次调用新建连接”与线程复用的 WAL 连接。
+
+用法::
+
+    python bench_sqlite.py --images 500 --detections 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+
+from database import ResultRepository
+
+
+class PerCallRepository(ResultRepository):
+    """The previous behaviour: a fresh rollback-journal connection per call."""
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.execute("PRAGMA foreign_keys = ON")
+        return conn
+
+
+def _insert_images(repo: ResultRepository, images: int, detections: int) -> None:
+    for i in range(images):
+        file_hash = uuid.uuid4().hex
+        for j in range(detections):
+            repo.insert_result(f"bench_{i}.jpg", "mirror", float(j), float(j), 0.9, file_hash)
+
+
+def _insert_images_bulk(repo: ResultRepository, images: int, detections: int) -> None:
+    dets = [{"target": "mirror", "center": [float(j), float(j)], "confidence": 0.9} for j in range(detections)]
+    for i in range(images):
+        repo.insert_results(f"bench_{i}.jpg", uuid.uuid4().hex, dets)
+
+
+def _timed(label: str, rows: int, fn: Callable[[], None]) -> float:
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:<28}{elapsed:>8.2f} s{rows / elapsed:>12.0f} rows/s")
+    return elapsed
+
+
+def _run(name: str, factory: Callable[[Path], ResultRepository], args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        repo = factory(Path(tmp) / "bench.db")
+        rows = args.images * args.detections
+        print(name)
+        _timed("insert (1 thread)", rows, lambda: _insert_images(repo, args.images, args.detections))
+
+        def concurrent_insert() -> None:
+            threads = [
+                threading.Thread(target=_insert_images, args=(repo, args.images // 2, args.detections))
+                for _ in range(2)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        _timed("insert (2 threads)", rows, concurrent_insert)
+        _timed("insert_results per image", rows, lambda: _insert_images_bulk(repo, args.images, args.detections))
+
+        def read_history() -> None:
+            for _ in range(args.reads):
+                repo.fetch_results(limit=50)
+
+        _timed(f"history reads x{args.reads}", args.reads * 50, read_history)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark ResultRepository connection handling")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--detections", type=int, default=20, help="detections per image")
+    parser.add_argument("--reads", type=int, default=500)
+    args = parser.parse_args()
+
+    _run("per-call connections, rollback journal", PerCallRepository, args)
+    _run("pooled WAL connections", ResultRepository, args)
+
+
+if __name__ == "__main__":
+    main()
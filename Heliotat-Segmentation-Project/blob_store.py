@@ -0,0 +1,79 @@
+"""标注图像存储：按文件哈希寻址的磁盘目录，每张图片只保存一份 PNG。"""
+
+from __future__ import annotations
+
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional
+
+_HASH_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+class AnnotatedImageStore:
+    """Content-addressed PNG store keyed by the upload's MD5 ``file_hash``.
+
+    Files live at ``<root>/<hash[:2]>/<hash>.png``. Since an upload hash always
+    maps to the same annotated image, files are immutable once written.
+    """
+
+    def __init__(self, root: Path):
+        # Absolute, so send_file() does not resolve paths against Flask's root_path
+        self.root = Path(root).resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def is_valid_hash(file_hash: str) -> bool:
+        return bool(_HASH_RE.match(file_hash or ""))
+
+    def path_for(self, file_hash: str) -> Path:
+        if not self.is_valid_hash(file_hash):
+            raise ValueError(f"invalid file hash: {file_hash!r}")
+        return self.root / file_hash[:2] / f"{file_hash}.png"
+
+    def exists(self, file_hash: str) -> bool:
+        return self.is_valid_hash(file_hash) and self.path_for(file_hash).exists()
+
+    def get_path(self, file_hash: str) -> Optional[Path]:
+        if not self.exists(file_hash):
+            return None
+        return self.path_for(file_hash)
+
+    def put(self, file_hash: str, data: bytes) -> Path:
+        """Write ``data`` once; concurrent writers of the same hash are harmless."""
+        path = self.path_for(file_hash)
+        if path.exists():
+            return path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_name, path)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.unlink(tmp_name)
+            raise
+        return path
+
+    def delete(self, file_hash: str) -> bool:
+        path = self.get_path(file_hash)
+        if path is None:
+            return False
+        path.unlink()
+        return True
+
+    def prune(self, older_than_days: float) -> int:
+        """Delete PNGs written more than ``older_than_days`` ago; returns how many."""
+        cutoff = time.time() - older_than_days * 86400
+        removed = 0
+        for path in self.root.glob("??/*.png"):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
@@ -0,0 +1,338 @@
+"""MySQL 只读接口的读穿缓存：按方法设置 TTL，LRU 限制条目数，同一键并发未命中时只查询一次。
+
+写入路径调用 ``invalidate`` 使相关缓存失效。设置 ``CACHE_SHARED_PATH`` 后，多个 gunicorn
+worker 通过同一个 SQLite 文件共享缓存值与失效代数（generation），某个 worker 写入后其他
+worker 在下一次读取时即可看到；未设置时缓存只在本进程内有效，失效也只作用于本进程。
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+# Seconds each MySQLRepository read stays cached; methods not listed are not cached.
+# heliostat_info only changes on a re-import, inspections when a flight is ingested.
+# "heliostat_listing" is the serialized /api/heliostats body (see ``cached_body``).
+DEFAULT_TTLS: Dict[str, float] = {
+    "heliostat_listing": 600,
+    "get_dashboard_stats": 30,
+    "get_heliostat_count_by_zone": 600,
+    "get_latest_cleanliness_by_zone": 60,
+    "get_heliostats_by_zone": 600,
+    "get_latest_states": 30,
+    "get_cleanliness_history": 60,
+    "get_flight_records": 60,
+}
+
+# Write method -> cached methods it makes stale (None: everything)
+DEFAULT_INVALIDATES: Dict[str, Optional[Tuple[str, ...]]] = {
+    "rebuild_rollups": None,
+    "bulk_insert_inspections": (
+        "get_dashboard_stats",
+        "get_latest_cleanliness_by_zone",
+        "get_latest_states",
+        "get_cleanliness_history",
+    ),
+}
+
+# Generation of every namespace at once, bumped by a full invalidation
+_ALL = "*"
+
+
+def parse_ttls(spec: str) -> Dict[str, float]:
+    """``"get_dashboard_stats=10,get_heliostats_by_zone=0"``; 0 disables caching of that method."""
+    ttls: Dict[str, float] = {}
+    for part in spec.split(","):
+        if "=" in part:
+            name, value = part.split("=", 1)
+            ttls[name.strip()] = float(value)
+    return ttls
+
+
+class _SharedStore:
+    """Values and per-namespace generations in a SQLite file shared by all workers."""
+
+    def __init__(self, path: Path, busy_timeout: float = 1.0):
+        self.path = Path(path)
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._writes = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_generations ("
+                "namespace TEXT PRIMARY KEY, generation INTEGER NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = OFF")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def generations(self, namespace: str) -> Dict[str, int]:
+        rows = self._connect().execute(
+            "SELECT namespace, generation FROM cache_generations WHERE namespace IN (?, ?)",
+            (_ALL, namespace),
+        ).fetchall()
+        return dict(rows)
+
+    def bump(self, namespaces: Optional[Iterable[str]]) -> None:
+        with self._connect() as conn:
+            if namespaces is None:
+                conn.execute("DELETE FROM cache_entries")
+                namespaces = [_ALL]
+            for namespace in namespaces:
+                conn.execute(
+                    "INSERT INTO cache_generations (namespace, generation) VALUES (?, 1) "
+                    "ON CONFLICT(namespace) DO UPDATE SET generation = generation + 1",
+                    (namespace,),
+                )
+
+    def get(self, key: str) -> Tuple[bool, Any, float]:
+        row = self._connect().execute(
+            "SELECT value, expires_at FROM cache_entries WHERE key = ? AND expires_at > ?",
+            (key, time.time()),
+        ).fetchone()
+        if row is None:
+            return False, None, 0.0
+        return True, json.loads(row[0]), row[1]
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        data = json.dumps(value, ensure_ascii=False, default=str)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, data, expires_at),
+            )
+            self._writes += 1
+            # Keys of older generations are never read again; sweep them now and then
+            if self._writes % 100 == 0:
+                conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+
+
+def _copy(value: Any) -> Any:
+    """Copy the dict/list structure of a cached value (leaves are immutable scalars)."""
+    if isinstance(value, dict):
+        return {k: _copy(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_copy(v) for v in value]
+    return value
+
+
+class ReadThroughCache:
+    """LRU of ``(namespace, key) -> value`` with a TTL per entry.
+
+    ``get_or_load`` calls the loader at most once per key at a time in this
+    process: concurrent misses wait up to ``wait_timeout`` for the first
+    caller's result instead of all querying MySQL, then load it themselves.
+    Every caller gets its own copy, so mutating a result never changes the
+    cache. Empty results (which is also what the repository returns on
+    errors) are not cached.
+    """
+
+    def __init__(self, max_entries: int = 1024, shared_path: Optional[Path] = None, wait_timeout: float = 10.0):
+        self.max_entries = max(1, max_entries)
+        self.wait_timeout = wait_timeout
+        self.shared = _SharedStore(shared_path) if shared_path else None
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._loading: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "waits": 0, "evictions": 0, "errors": 0}
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self._stats[key] += 1
+
+    def _full_key(self, namespace: str, key: str) -> str:
+        """Cache key including the current generations, so invalidating never has to find old keys."""
+        generations = None
+        if self.shared is not None:
+            try:
+                generations = self.shared.generations(namespace)
+            except sqlite3.Error:
+                self._count("errors")
+        if generations is None:
+            with self._lock:
+                generations = dict(self._generations)
+        return f"{namespace}:{generations.get(_ALL, 0)}.{generations.get(namespace, 0)}:{key}"
+
+    def _lookup(self, namespace: str, key: str) -> Tuple[bool, Any]:
+        full_key = self._full_key(namespace, key)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(full_key)
+                    self._stats["hits"] += 1
+                    return True, entry[0]
+                del self._entries[full_key]
+        if self.shared is not None:
+            try:
+                found, value, expires_at = self.shared.get(full_key)
+            except sqlite3.Error:
+                self._count("errors")
+                found = False
+            if found:
+                self._store_local(full_key, value, expires_at)
+                self._count("shared_hits")
+                return True, value
+        return False, None
+
+    def _store_local(self, full_key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[full_key] = (value, expires_at)
+            self._entries.move_to_end(full_key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+
+    def get_or_load(self, namespace: str, key: str, loader: Callable[[], Any], ttl: float) -> Any:
+        return _copy(self._get_or_load(namespace, key, loader, ttl))
+
+    def _get_or_load(self, namespace: str, key: str, loader: Callable[[], Any], ttl: float) -> Any:
+        found, value = self._lookup(namespace, key)
+        if found:
+            return value
+        slot = f"{namespace}:{key}"
+        with self._lock:
+            event = self._loading.get(slot)
+            loading = event is not None
+            if loading:
+                self._stats["waits"] += 1
+            else:
+                event = self._loading[slot] = threading.Event()
+        if loading:
+            # Another thread is loading this key; use its result once it is stored
+            if event.wait(self.wait_timeout):
+                found, value = self._lookup(namespace, key)
+                if found:
+                    return value
+            # Its result was empty, it failed or it is stuck: load ourselves
+            return loader()
+
+        self._count("misses")
+        # Read the generation before loading so an invalidation during the
+        # query stores the (possibly stale) result under the old generation
+        full_key = self._full_key(namespace, key)
+        try:
+            value = loader()
+            if value:
+                expires_at = time.time() + ttl
+                self._store_local(full_key, value, expires_at)
+                if self.shared is not None:
+                    try:
+                        self.shared.set(full_key, value, expires_at)
+                    except (sqlite3.Error, TypeError, ValueError):
+                        self._count("errors")
+            return value
+        finally:
+            with self._lock:
+                del self._loading[slot]
+            event.set()
+
+    def invalidate(self, namespaces: Optional[Iterable[str]] = None) -> None:
+        """Make the given namespaces (all when ``None``) stale in every process sharing the cache."""
+        names = None if namespaces is None else list(namespaces)
+        with self._lock:
+            if names is None:
+                self._entries.clear()
+                bumped = [_ALL]
+            else:
+                prefixes = tuple(f"{name}:" for name in names)
+                for full_key in [k for k in self._entries if k.startswith(prefixes)]:
+                    del self._entries[full_key]
+                bumped = names
+            for name in bumped:
+                self._generations[name] = self._generations.get(name, 0) + 1
+        if self.shared is not None:
+            try:
+                self.shared.bump(names)
+            except sqlite3.Error:
+                self._count("errors")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["shared_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((stats["hits"] + stats["shared_hits"]) / lookups, 3) if lookups else None
+        stats["max_entries"] = self.max_entries
+        stats["shared"] = str(self.shared.path) if self.shared else None
+        return stats
+
+
+class CachedRepository:
+    """Wraps a ``MySQLRepository``: methods in ``ttls`` read through ``cache``,
+    methods in ``invalidates`` drop the cached reads they affect after running,
+    everything else passes straight through.
+    """
+
+    def __init__(
+        self,
+        repository: Any,
+        cache: ReadThroughCache,
+        ttls: Optional[Dict[str, float]] = None,
+        invalidates: Optional[Dict[str, Optional[Tuple[str, ...]]]] = None,
+    ):
+        self.repository = repository
+        self.cache = cache
+        self.ttls = {name: ttl for name, ttl in (DEFAULT_TTLS if ttls is None else ttls).items() if ttl > 0}
+        self.invalidates = DEFAULT_INVALIDATES if invalidates is None else invalidates
+
+    def invalidate(self, methods: Optional[Iterable[str]] = None) -> None:
+        """Drop cached reads of ``methods`` (all when ``None``); raises ValueError on unknown names."""
+        if methods is not None:
+            methods = list(methods)
+            unknown = [name for name in methods if name not in self.ttls]
+            if unknown:
+                raise ValueError(f"not cached: {', '.join(map(str, unknown))}")
+        self.cache.invalidate(methods)
+
+    def cached_body(self, namespace: str, key: str, render: Callable[[], str]) -> str:
+        """Response body rendered from a streamed listing, cached under ``namespace``'s TTL.
+
+        For listings served from ``iter_*`` generators, which cannot be cached
+        themselves; ``render`` runs uncached when ``namespace`` has no TTL.
+        """
+        if namespace not in self.ttls:
+            return render()
+        return self.cache.get_or_load(namespace, key, render, self.ttls[namespace])
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.repository, name)
+        if name in self.ttls:
+            ttl = self.ttls[name]
+
+            def cached(*args, **kwargs):
+                key = json.dumps([args, kwargs], sort_keys=True, default=str)
+                return self.cache.get_or_load(name, key, lambda: attr(*args, **kwargs), ttl)
+
+            return cached
+        if name in self.invalidates:
+            affected = self.invalidates[name]
+
+            def writing(*args, **kwargs):
+                try:
+                    return attr(*args, **kwargs)
+                finally:
+                    self.cache.invalidate(affected)
+
+            return writing
+        return attr
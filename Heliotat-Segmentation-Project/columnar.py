@@ -0,0 +1,152 @@
+"""列式导出：把检测历史与巡检记录按 record batch 写成 Parquet 或 Arrow IPC。
+
+pyarrow 为可选依赖，未安装时 ``PYARROW_AVAILABLE`` 为 False，导出接口返回 501。
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+
+MIMETYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+
+# Column name -> arrow type name; resolved lazily so the module imports without pyarrow
+HISTORY_COLUMNS = {
+    "id": "int64",
+    "time": "timestamp",
+    "filename": "string",
+    "target": "string",
+    "center_x": "float32",
+    "center_y": "float32",
+    "confidence": "float32",
+}
+
+INSPECTION_COLUMNS = {
+    "id": "int64",
+    "heliostat_id": "int32",
+    "zone": "string",
+    "image_path": "string",
+    "cleanliness": "float32",
+    "confidence": "float32",
+    "timestamp": "timestamp",
+    "flight_id": "int32",
+}
+
+
+def _require_pyarrow() -> None:
+    if not PYARROW_AVAILABLE:
+        raise ImportError("pyarrow is not installed. Run: pip install pyarrow")
+
+
+def build_schema(columns: Dict[str, str]) -> "pa.Schema":
+    _require_pyarrow()
+    types = {
+        "int32": pa.int32(),
+        "int64": pa.int64(),
+        "float32": pa.float32(),
+        "string": pa.string(),
+        "timestamp": pa.timestamp("us"),
+    }
+    return pa.schema([(name, types[kind]) for name, kind in columns.items()])
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    """MySQL keeps ISO strings (``2025-11-17T15:05:37.917922``), SQLite ``YYYY-MM-DD HH:MM:SS``."""
+    if value is None or isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def record_batches(
+    records: Iterable[Dict], schema: "pa.Schema", batch_rows: int = 65536
+) -> Iterator["pa.RecordBatch"]:
+    """Group dict records into typed record batches of at most ``batch_rows`` rows."""
+    timestamp_fields = [f.name for f in schema if pa.types.is_timestamp(f.type)]
+    columns: Dict[str, List[Any]] = {name: [] for name in schema.names}
+    count = 0
+    for record in records:
+        for name in schema.names:
+            columns[name].append(record.get(name))
+        count += 1
+        if count >= batch_rows:
+            yield _to_batch(columns, schema, timestamp_fields)
+            columns = {name: [] for name in schema.names}
+            count = 0
+    if count:
+        yield _to_batch(columns, schema, timestamp_fields)
+
+
+def _to_batch(columns: Dict[str, List[Any]], schema: "pa.Schema", timestamp_fields: List[str]) -> "pa.RecordBatch":
+    for name in timestamp_fields:
+        columns[name] = [_to_datetime(v) for v in columns[name]]
+    arrays = [pa.array(columns[f.name], type=f.type, from_pandas=True) for f in schema]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object that hands written bytes back to a generator."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def columnar_stream(records: Iterable[Dict], columns: Dict[str, str], fmt: str, batch_rows: int = 65536) -> Iterator[bytes]:
+    """Encode ``records`` as Parquet (one row group per batch) or Arrow IPC, yielding bytes as batches are written."""
+    if fmt not in COLUMNAR_FORMATS:
+        raise ValueError(f"unsupported format: {fmt}")
+    schema = build_schema(columns)
+    sink = _ChunkSink()
+    stream = pa.PythonFile(sink, mode="w")
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(stream, schema, compression="zstd")
+    else:
+        options = pa.ipc.IpcWriteOptions(compression="zstd")
+        writer = pa.ipc.new_file(stream, schema, options=options)
+    try:
+        for batch in record_batches(records, schema, batch_rows):
+            writer.write_batch(batch)
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,106 @@
+"""比较不同推理后端（torch / onnx / openvino）的延迟与检测结果一致性。
+
+用法::
+
+    python compare_runtimes.py --images heliotat/images/val --runtimes torch onnx openvino
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image
+
+from inference import RUNTIMES, load_model, predict_batch
+
+
+IMAGE_SUFFIXES = {".png", ".jpg", ".jpeg", ".bmp"}
+
+
+def _load_images(folder: Path, limit: int) -> List[np.ndarray]:
+    paths = sorted(p for p in folder.iterdir() if p.suffix.lower() in IMAGE_SUFFIXES)[:limit]
+    return [np.array(Image.open(p).convert("RGB")) for p in paths]
+
+
+def _match(reference: List[Dict], candidate: List[Dict], tolerance: float) -> Dict[str, float]:
+    """Greedily pair detections of the same class whose centers are within ``tolerance`` px."""
+    unused = list(range(len(candidate)))
+    matched = 0
+    conf_diffs = []
+    for ref in sorted(reference, key=lambda d: -d["confidence"]):
+        best, best_dist = None, tolerance
+        for j in unused:
+            cand = candidate[j]
+            if cand["target"] != ref["target"]:
+                continue
+            dist = float(np.hypot(*np.subtract(ref["center"], cand["center"])))
+            if dist <= best_dist:
+                best, best_dist = j, dist
+        if best is not None:
+            unused.remove(best)
+            matched += 1
+            conf_diffs.append(abs(ref["confidence"] - candidate[best]["confidence"]))
+    return {
+        "matched": matched,
+        "reference": len(reference),
+        "candidate": len(candidate),
+        "conf_diff": sum(conf_diffs),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare inference runtimes against torch")
+    parser.add_argument("--images", type=Path, required=True, help="folder of test images")
+    parser.add_argument("--weights", type=Path, default=Path("best.pt"))
+    parser.add_argument("--runtimes", nargs="+", choices=RUNTIMES, default=list(RUNTIMES))
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--limit", type=int, default=100, help="max images to use")
+    parser.add_argument("--tolerance", type=float, default=5.0, help="center distance in px for a match")
+    args = parser.parse_args()
+
+    images = _load_images(args.images, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.images}")
+
+    runtimes = ["torch"] + [r for r in args.runtimes if r != "torch"]
+    outputs: Dict[str, List[List[Dict]]] = {}
+    latencies: Dict[str, List[float]] = {}
+    for runtime in runtimes:
+        model = load_model(args.weights, runtime)
+        predict_batch(model, images[:1], conf=args.conf)  # warmup, not timed
+        outputs[runtime], latencies[runtime] = [], []
+        for image in images:
+            start = time.perf_counter()
+            (data, _), = predict_batch(model, [image], conf=args.conf)
+            latencies[runtime].append((time.perf_counter() - start) * 1000)
+            outputs[runtime].append(data["detections"])
+
+    print(f"{len(images)} images, conf={args.conf}, match tolerance={args.tolerance}px\n")
+    header = f"{'runtime':<10}{'mean ms':>10}{'p95 ms':>10}{'speedup':>9}{'dets':>8}{'recall':>9}{'precision':>11}{'Δconf':>8}"
+    print(header)
+    print("-" * len(header))
+    torch_mean = statistics.mean(latencies["torch"])
+    for runtime in runtimes:
+        lat = sorted(latencies[runtime])
+        mean = statistics.mean(lat)
+        p95 = lat[min(len(lat) - 1, int(len(lat) * 0.95))]
+        totals = {"matched": 0, "reference": 0, "candidate": 0, "conf_diff": 0.0}
+        for ref, cand in zip(outputs["torch"], outputs[runtime]):
+            for key, value in _match(ref, cand, args.tolerance).items():
+                totals[key] += value
+        recall = totals["matched"] / totals["reference"] if totals["reference"] else 1.0
+        precision = totals["matched"] / totals["candidate"] if totals["candidate"] else 1.0
+        conf_diff = totals["conf_diff"] / totals["matched"] if totals["matched"] else 0.0
+        print(
+            f"{runtime:<10}{mean:>10.1f}{p95:>10.1f}{torch_mean / mean:>8.2f}x"
+            f"{totals['candidate']:>8}{recall:>9.3f}{precision:>11.3f}{conf_diff:>8.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
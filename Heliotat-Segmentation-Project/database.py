@@ -2,48 +2,320 @@
 
 from __future__ import annotations
 
+import base64
+import json
+import os
+import re
 import sqlite3
+import threading
 from pathlib import Path
-from typing import List, Optional
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+def _migrate_v1_legacy_table(conn: sqlite3.Connection) -> None:
+    """Baseline: the original flat ``detection_results`` table."""
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS detection_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            filename TEXT NOT NULL,
+            target TEXT NOT NULL,
+            center_x REAL NOT NULL,
+            center_y REAL NOT NULL,
+            confidence REAL NOT NULL,
+            file_hash TEXT,
+            annotated_image TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(detection_results)")}
+    if "file_hash" not in columns:
+        conn.execute("ALTER TABLE detection_results ADD COLUMN file_hash TEXT")
+    if "annotated_image" not in columns:
+        conn.execute("ALTER TABLE detection_results ADD COLUMN annotated_image TEXT")
+
+
+def _migrate_v2_normalize(conn: sqlite3.Connection) -> None:
+    """Split ``detection_results`` into ``images`` and ``detections``.
+
+    One ``images`` row per upload hash; ``target='none'`` sentinel rows become
+    images without detections. Base64 annotated images left by old versions
+    are kept once per hash in ``legacy_annotated_images`` until they are moved
+    to the blob store.
+    """
+    conn.execute(
+        """
+        CREATE TABLE images (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            file_hash TEXT UNIQUE,
+            filename TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_images_created_at ON images(created_at)")
+    conn.execute(
+        """
+        CREATE TABLE detections (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            image_id INTEGER NOT NULL REFERENCES images(id) ON DELETE CASCADE,
+            target TEXT NOT NULL,
+            center_x REAL NOT NULL,
+            center_y REAL NOT NULL,
+            confidence REAL NOT NULL
+        )
+        """
+    )
+    conn.execute("CREATE INDEX idx_detections_image_id ON detections(image_id)")
+    conn.execute(
+        """
+        CREATE TABLE legacy_annotated_images (
+            file_hash TEXT PRIMARY KEY,
+            image_b64 TEXT NOT NULL
+        )
+        """
+    )
+    # SQLite takes the bare columns from the row holding MIN(created_at),
+    # so every hash keeps the filename of its first upload.
+    conn.execute(
+        """
+        INSERT INTO images (file_hash, filename, created_at)
+        SELECT file_hash, filename, MIN(created_at)
+        FROM detection_results
+        WHERE file_hash IS NOT NULL
+        GROUP BY file_hash
+        """
+    )
+    # Rows written before file hashing existed: one image per upload batch
+    conn.execute(
+        """
+        INSERT INTO images (file_hash, filename, created_at)
+        SELECT NULL, filename, created_at
+        FROM detection_results
+        WHERE file_hash IS NULL
+        GROUP BY filename, created_at
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO detections (image_id, target, center_x, center_y, confidence)
+        SELECT i.id, d.target, d.center_x, d.center_y, d.confidence
+        FROM detection_results d
+        JOIN images i ON i.file_hash = d.file_hash
+        WHERE d.file_hash IS NOT NULL AND d.target != 'none'
+        ORDER BY d.id
+        """
+    )
+    conn.execute(
+        """
+        INSERT INTO detections (image_id, target, center_x, center_y, confidence)
+        SELECT i.id, d.target, d.center_x, d.center_y, d.confidence
+        FROM detection_results d
+        JOIN images i
+            ON i.file_hash IS NULL AND i.filename = d.filename AND i.created_at IS d.created_at
+        WHERE d.file_hash IS NULL AND d.target != 'none'
+        ORDER BY d.id
+        """
+    )
+    conn.execute(
+        """
+        INSERT OR IGNORE INTO legacy_annotated_images (file_hash, image_b64)
+        SELECT file_hash, annotated_image
+        FROM detection_results
+        WHERE file_hash IS NOT NULL AND annotated_image IS NOT NULL AND annotated_image != ''
+        """
+    )
+    conn.execute("DROP TABLE detection_results")
+
+
+def _migrate_v3_history_index(conn: sqlite3.Connection) -> None:
+    """Covering index for keyset-paginated history: (created_at, id) plus filename."""
+    conn.execute("CREATE INDEX idx_images_history ON images(created_at, id, filename)")
+    conn.execute("DROP INDEX idx_images_created_at")
+
+
+def _migrate_v4_filename_fts(conn: sqlite3.Connection) -> None:
+    """FTS5 index over ``images.filename``, kept in sync by triggers.
+
+    The default unicode61 tokenizer splits on ``_``, ``-`` and ``.``, so drone
+    filenames such as ``DJI_20240315_Z03_0012.jpg`` are searchable by date or
+    zone token. SQLite builds without FTS5 skip this step and keep using LIKE.
+    """
+    try:
+        conn.execute(
+            "CREATE VIRTUAL TABLE images_fts USING fts5(filename, content='images', content_rowid='id')"
+        )
+    except sqlite3.OperationalError as exc:
+        if "fts5" not in str(exc):
+            raise
+        print(f"⚠️ SQLite FTS5 unavailable, history search falls back to LIKE: {exc}")
+        return
+    conn.execute(
+        """
+        CREATE TRIGGER images_fts_insert AFTER INSERT ON images BEGIN
+            INSERT INTO images_fts (rowid, filename) VALUES (new.id, new.filename);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER images_fts_delete AFTER DELETE ON images BEGIN
+            INSERT INTO images_fts (images_fts, rowid, filename) VALUES ('delete', old.id, old.filename);
+        END
+        """
+    )
+    conn.execute(
+        """
+        CREATE TRIGGER images_fts_update AFTER UPDATE OF filename ON images BEGIN
+            INSERT INTO images_fts (images_fts, rowid, filename) VALUES ('delete', old.id, old.filename);
+            INSERT INTO images_fts (rowid, filename) VALUES (new.id, new.filename);
+        END
+        """
+    )
+    conn.execute("INSERT INTO images_fts (images_fts) VALUES ('rebuild')")
+
+
+# Index i holds the step that upgrades a database from user_version i to i + 1.
+# Append new steps; never edit one that has shipped.
+MIGRATIONS: List[Callable[[sqlite3.Connection], None]] = [
+    _migrate_v1_legacy_table,
+    _migrate_v2_normalize,
+    _migrate_v3_history_index,
+    _migrate_v4_filename_fts,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Detection history rows; images without detections show up once as target 'none'
+_HISTORY_SELECT = """
+    SELECT
+        i.id AS image_id,
+        COALESCE(d.id, 0) AS detection_id,
+        i.filename AS filename,
+        COALESCE(d.target, 'none') AS target,
+        COALESCE(d.center_x, -1.0) AS center_x,
+        COALESCE(d.center_y, -1.0) AS center_y,
+        COALESCE(d.confidence, 0.0) AS confidence,
+        i.created_at AS created_at
+    FROM images i
+    LEFT JOIN detections d ON d.image_id = i.id
+"""
+
+
+def fts_query(search: str) -> Optional[str]:
+    """Turn free-text search into an FTS5 query, or ``None`` if it has no tokens.
+
+    Whitespace-separated terms must all match; punctuation inside a term
+    (``DJI_2024``) makes it a phrase, and the last token of every term is a
+    prefix, so ``Z03 202403`` finds ``DJI_20240315_Z03_0012.jpg``.
+    """
+    phrases = []
+    for term in search.split():
+        tokens = re.findall(r"[^\W_]+", term)
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"*')
+    return " AND ".join(phrases) or None
+
+
+def encode_cursor(row: sqlite3.Row) -> str:
+    """Opaque keyset cursor pointing just after ``row`` in history order."""
+    key = [row["created_at"], row["image_id"], row["detection_id"]]
+    return base64.urlsafe_b64encode(json.dumps(key).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int, int]:
+    """Inverse of :func:`encode_cursor`; raises ``ValueError`` for malformed input."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, image_id, detection_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(created_at), int(image_id), int(detection_id)
+    except Exception as exc:  # noqa: BLE001
+        raise ValueError(f"invalid cursor: {cursor!r}") from exc
+
+
+# Applied to every pooled connection. WAL lets /api/history readers run while
+# a gunicorn worker writes; synchronous=NORMAL is durable across process
+# crashes in WAL mode and only risks the last commits on power loss.
+CONNECTION_PRAGMAS = (
+    # Must precede journal_mode to take effect on a new file; existing
+    # databases switch over with ``python maintenance.py --vacuum``.
+    "PRAGMA auto_vacuum = INCREMENTAL",
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 268435456",
+    "PRAGMA temp_store = MEMORY",
+)
 
 
 class ResultRepository:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, busy_timeout: float = 5.0):
         self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_schema()
+        self.has_fts = self._table_exists("images_fts")
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        """Return this thread's persistent connection, opening it on first use.
+
+        Used as ``with self._connect() as conn``, which commits or rolls back
+        but leaves the connection open for the next call.
+        """
+        conn = getattr(self._local, "conn", None)
+        # A forked gunicorn worker must not reuse its parent's connection
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=self.busy_timeout)
+            conn.row_factory = sqlite3.Row
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
         return conn
 
+    def close(self) -> None:
+        """Close the calling thread's connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
     def _init_schema(self) -> None:
+        self._migrate(self._connect())
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """Bring the database up to ``SCHEMA_VERSION``, one transaction per step."""
+        # Databases from before versioning report user_version 0; step 1 is
+        # written to accept their existing detection_results table as-is.
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Another worker may have migrated while we waited for the lock
+                current = conn.execute("PRAGMA user_version").fetchone()[0]
+                if current >= target:
+                    conn.rollback()
+                    continue
+                MIGRATIONS[target - 1](conn)
+                conn.execute(f"PRAGMA user_version = {target}")
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+
+    def _table_exists(self, name: str) -> bool:
         with self._connect() as conn:
-            conn.execute(
-                """
-                CREATE TABLE IF NOT EXISTS detection_results (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filename TEXT NOT NULL,
-                    target TEXT NOT NULL,
-                    center_x REAL NOT NULL,
-                    center_y REAL NOT NULL,
-                    confidence REAL NOT NULL,
-                    file_hash TEXT,
-                    annotated_image TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-                """
-            )
-            self._ensure_columns(conn)
+            row = conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+        return row is not None
 
-    def _ensure_columns(self, conn: sqlite3.Connection) -> None:
-        cursor = conn.execute("PRAGMA table_info(detection_results)")
-        columns = {row[1] for row in cursor.fetchall()}
-        if "file_hash" not in columns:
-            conn.execute("ALTER TABLE detection_results ADD COLUMN file_hash TEXT")
-        if "annotated_image" not in columns:
-            conn.execute("ALTER TABLE detection_results ADD COLUMN annotated_image TEXT")
+    def _search_condition(self, search: str) -> Tuple[str, List[object]]:
+        match = fts_query(search) if self.has_fts else None
+        if match is None:
+            return "i.filename LIKE ?", [f"%{search}%"]
+        return "i.id IN (SELECT rowid FROM images_fts WHERE images_fts MATCH ?)", [match]
 
     def insert_result(
         self,
@@ -53,59 +325,211 @@ class ResultRepository:
         center_y: float,
         confidence: float,
         file_hash: str,
-        annotated_image: Optional[str],
     ) -> None:
+        """Record one detection; ``target='none'`` records an image without detections."""
         with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO images (file_hash, filename) VALUES (?, ?)",
+                (file_hash, filename),
+            )
+            if target == "none":
+                return
             conn.execute(
                 """
-                INSERT INTO detection_results (
-                    filename,
-                    target,
-                    center_x,
-                    center_y,
-                    confidence,
-                    file_hash,
-                    annotated_image
+                INSERT INTO detections (image_id, target, center_x, center_y, confidence)
+                SELECT id, ?, ?, ?, ? FROM images WHERE file_hash = ?
+                """,
+                (target, center_x, center_y, confidence, file_hash),
+            )
+
+    def insert_results(
+        self, filename: str, file_hash: str, detections: Sequence[Dict[str, object]]
+    ) -> bool:
+        """Record an image and all of its detections in one transaction."""
+        return self.insert_batch([(filename, file_hash, detections)]) == 1
+
+    def insert_batch(
+        self, items: Iterable[Tuple[str, str, Sequence[Dict[str, object]]]]
+    ) -> int:
+        """Record many ``(filename, file_hash, detections)`` images in a single commit.
+
+        Detections use the API schema (``target``, ``center``, ``confidence``).
+        An image whose hash is already stored is skipped together with its
+        detections, so replaying a batch never duplicates rows. Returns the
+        number of images actually inserted.
+        """
+        inserted = 0
+        detection_rows: List[Tuple[object, ...]] = []
+        with self._connect() as conn:
+            for filename, file_hash, detections in items:
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO images (file_hash, filename) VALUES (?, ?)",
+                    (file_hash, filename),
                 )
-                VALUES (?, ?, ?, ?, ?, ?, ?)
+                if cursor.rowcount == 0:
+                    continue
+                inserted += 1
+                image_id = cursor.lastrowid
+                for det in detections:
+                    center = det.get("center", [0.0, 0.0])
+                    detection_rows.append(
+                        (
+                            image_id,
+                            det.get("target", "unknown"),
+                            center[0],
+                            center[1],
+                            det.get("confidence", 0.0),
+                        )
+                    )
+            conn.executemany(
+                """
+                INSERT INTO detections (image_id, target, center_x, center_y, confidence)
+                VALUES (?, ?, ?, ?, ?)
                 """,
-                (
-                    filename,
-                    target,
-                    center_x,
-                    center_y,
-                    confidence,
-                    file_hash,
-                    annotated_image,
-                ),
+                detection_rows,
             )
+        return inserted
 
     def get_results_by_hash(self, file_hash: str) -> List[sqlite3.Row]:
         with self._connect() as conn:
             cursor = conn.execute(
-                """
-                SELECT filename, target, center_x, center_y, confidence, annotated_image, created_at
-                FROM detection_results
-                WHERE file_hash = ?
-                ORDER BY created_at DESC
-                """,
+                _HISTORY_SELECT + " WHERE i.file_hash = ? ORDER BY d.id",
                 (file_hash,),
             )
             return cursor.fetchall()
 
-    def fetch_results(
-        self, limit: int = 50, search: Optional[str] = None
-    ) -> List[sqlite3.Row]:
-        query = (
-            "SELECT filename, target, center_x, center_y, confidence, created_at FROM detection_results"
+    def get_legacy_annotated(self, file_hash: str) -> Optional[str]:
+        """Base64 annotated image written inline by older versions, if any."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT image_b64 FROM legacy_annotated_images WHERE file_hash = ?",
+                (file_hash,),
+            ).fetchone()
+            return row["image_b64"] if row else None
+
+    def clear_legacy_annotated(self, file_hash: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM legacy_annotated_images WHERE file_hash = ?", (file_hash,))
+
+    def has_legacy_annotated(self, file_hash: str) -> bool:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM legacy_annotated_images WHERE file_hash = ?", (file_hash,)
+            ).fetchone()
+            return row is not None
+
+    # ---- retention / maintenance (see maintenance.py) ----
+
+    def images_before(self, cutoff: str, limit: int = 1000) -> List[sqlite3.Row]:
+        """Oldest images created before ``cutoff`` (``YYYY-MM-DD HH:MM:SS``)."""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT id, created_at FROM images WHERE created_at < ? ORDER BY created_at, id LIMIT ?",
+                (cutoff, limit),
+            ).fetchall()
+
+    def archive_rows(self, image_ids: Sequence[int]) -> List[sqlite3.Row]:
+        """History rows (plus ``file_hash``) for the given images, oldest first."""
+        if not image_ids:
+            return []
+        placeholders = ",".join("?" * len(image_ids))
+        query = _HISTORY_SELECT.replace(
+            "i.created_at AS created_at", "i.created_at AS created_at,\n        i.file_hash AS file_hash"
         )
+        query += f" WHERE i.id IN ({placeholders}) ORDER BY i.created_at, i.id, d.id"
+        with self._connect() as conn:
+            return conn.execute(query, list(image_ids)).fetchall()
+
+    def delete_images(self, image_ids: Sequence[int]) -> int:
+        """Delete images; their detections go with them via ON DELETE CASCADE."""
+        if not image_ids:
+            return 0
+        placeholders = ",".join("?" * len(image_ids))
+        with self._connect() as conn:
+            return conn.execute(f"DELETE FROM images WHERE id IN ({placeholders})", list(image_ids)).rowcount
+
+    def delete_legacy_annotated_before(self, cutoff: str) -> int:
+        with self._connect() as conn:
+            return conn.execute(
+                """
+                DELETE FROM legacy_annotated_images
+                WHERE file_hash IN (SELECT file_hash FROM images WHERE created_at < ?)
+                """,
+                (cutoff,),
+            ).rowcount
+
+    def storage_stats(self) -> Dict[str, int]:
+        conn = self._connect()
+        stats = {
+            name: conn.execute(f"PRAGMA {name}").fetchone()[0]
+            for name in ("page_size", "page_count", "freelist_count", "auto_vacuum")
+        }
+        for key, path in (("file_bytes", self.db_path), ("wal_bytes", Path(f"{self.db_path}-wal"))):
+            stats[key] = path.stat().st_size if path.exists() else 0
+        return stats
+
+    def enable_incremental_vacuum(self) -> None:
+        """Switch to auto_vacuum=INCREMENTAL; needs a full VACUUM that locks the database."""
+        conn = self._connect()
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM")
+
+    def incremental_vacuum(self, pages: int) -> int:
+        """Return up to ``pages`` free pages to the OS; no-op unless auto_vacuum is INCREMENTAL."""
+        conn = self._connect()
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        # execute() steps the pragma once (one page); executescript runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)})")
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    def fetch_page(
+        self, limit: int = 50, search: Optional[str] = None, cursor: Optional[str] = None
+    ) -> Tuple[List[sqlite3.Row], Optional[str]]:
+        """One page of history plus the cursor of the next page (``None`` at the end).
+
+        Rows are ordered newest image first, detections in insertion order.
+        Paging seeks on the ``(created_at, id)`` index instead of using
+        OFFSET, so deep pages cost the same as the first one. ``search`` is
+        matched as filename tokens/prefixes through ``images_fts`` (see
+        :func:`fts_query`), falling back to a substring LIKE without FTS5.
+        """
+        query = _HISTORY_SELECT
+        conditions: List[str] = []
         params: List[object] = []
         if search:
-            query += " WHERE filename LIKE ?"
-            params.append(f"%{search}%")
-        query += " ORDER BY created_at DESC LIMIT ?"
-        params.append(limit)
+            condition, search_params = self._search_condition(search)
+            conditions.append(condition)
+            params.extend(search_params)
+        if cursor:
+            created_at, image_id, detection_id = decode_cursor(cursor)
+            # Rest of the cursor's image, then everything older
+            conditions.append("(i.created_at, i.id) <= (?, ?) AND (i.id != ? OR d.id > ?)")
+            params.extend([created_at, image_id, image_id, detection_id])
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY i.created_at DESC, i.id DESC, d.id LIMIT ?"
+        params.append(limit + 1)
 
         with self._connect() as conn:
-            cursor = conn.execute(query, params)
-            return cursor.fetchall()
+            rows = conn.execute(query, params).fetchall()
+        if len(rows) > limit:
+            return rows[:limit], encode_cursor(rows[limit - 1])
+        return rows, None
+
+    def fetch_results(
+        self, limit: int = 50, search: Optional[str] = None, cursor: Optional[str] = None
+    ) -> List[sqlite3.Row]:
+        return self.fetch_page(limit=limit, search=search, cursor=cursor)[0]
+
+    def iter_results(self, search: Optional[str] = None, chunk_size: int = 1000) -> Iterator[sqlite3.Row]:
+        """Yield every history row in ``fetch_page`` order, ``chunk_size`` rows per query.
+
+        Each chunk is a short keyset query rather than one long-lived cursor,
+        so a slow download neither buffers the table nor pins a WAL snapshot.
+        """
+        cursor: Optional[str] = None
+        while True:
+            rows, cursor = self.fetch_page(limit=chunk_size, search=search, cursor=cursor)
+            yield from rows
+            if cursor is None:
+                return
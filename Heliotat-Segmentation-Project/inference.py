@@ -0,0 +1,326 @@
+"""YOLO-Seg 推理辅助：批量预测、切片推理与结果解析。"""
+
+from __future__ import annotations
+
+import io
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Overlay colours for tiled annotations, cycled by class id
+_PALETTE = [
+    (255, 56, 56),
+    (56, 56, 255),
+    (72, 249, 10),
+    (255, 157, 151),
+    (255, 178, 29),
+    (0, 194, 255),
+]
+
+
+RUNTIMES = ("torch", "onnx", "openvino")
+
+
+def exported_model_path(weights_path: Path, runtime: str) -> Path:
+    """Where the converted copy of ``weights_path`` for ``runtime`` is cached."""
+    if runtime == "onnx":
+        return weights_path.with_suffix(".onnx")
+    if runtime == "openvino":
+        return weights_path.parent / f"{weights_path.stem}_openvino_model"
+    return weights_path
+
+
+def _export(weights_path: Path, runtime: str) -> Path:
+    """Export ``weights_path`` for ``runtime`` unless an up-to-date copy exists.
+
+    A lock file keeps several gunicorn workers from exporting at the same time.
+    """
+    import fcntl
+
+    from ultralytics import YOLO
+
+    target = exported_model_path(weights_path, runtime)
+    lock_path = weights_path.with_name(f".{weights_path.name}.{runtime}.lock")
+    with open(lock_path, "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if target.exists() and target.stat().st_mtime >= weights_path.stat().st_mtime:
+            return target
+        print(f"ℹ Exporting {weights_path} to {runtime}, this only happens once")
+        # dynamic=True keeps the batch dimension free so micro-batching still works
+        exported = YOLO(str(weights_path)).export(format=runtime, dynamic=True)
+        return Path(exported)
+
+
+def load_model(weights_path: Path, runtime: str = "torch") -> Any:
+    """Load the YOLO-Seg weights with the requested CPU runtime.
+
+    ``onnx`` and ``openvino`` export ``best.pt`` on first use and cache the
+    converted model next to it; ultralytics wraps every runtime in the same
+    ``Results`` API, so the detection output does not change shape.
+    """
+    from ultralytics import YOLO
+
+    if runtime not in RUNTIMES:
+        raise ValueError(f"未知的推理后端 {runtime!r}，可选: {', '.join(RUNTIMES)}")
+    if not weights_path.exists():
+        raise FileNotFoundError("未找到 best.pt,请将训练好的 YOLO-Seg 权重放到项目根目录。")
+    if runtime == "torch":
+        return YOLO(str(weights_path))
+    return YOLO(str(_export(weights_path, runtime)), task="segment")
+
+
+class ModelHolder:
+    """Load the model off the request path and report its state.
+
+    ``start()`` loads and warms the model in a background thread so the web
+    app can answer non-inference endpoints immediately; ``get()`` blocks
+    until the model is ready (loading it on the spot if nobody started it).
+    """
+
+    def __init__(
+        self,
+        weights_path: Path,
+        runtime: str = "torch",
+        warmup_runs: int = 1,
+        warmup_size: int = 640,
+    ):
+        self.weights_path = weights_path
+        self.runtime = runtime
+        self.warmup_runs = max(0, warmup_runs)
+        self.warmup_size = warmup_size
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+        self._model: Any = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        with self._lock:
+            if self.state != "idle":
+                return
+            self.state = "loading"
+        threading.Thread(target=self._load, name="model-loader", daemon=True).start()
+
+    def _load(self) -> None:
+        try:
+            started = time.perf_counter()
+            model = load_model(self.weights_path, self.runtime)
+            self.load_seconds = round(time.perf_counter() - started, 3)
+
+            self.state = "warming"
+            started = time.perf_counter()
+            dummy = np.zeros((self.warmup_size, self.warmup_size, 3), dtype=np.uint8)
+            for _ in range(self.warmup_runs):
+                model.predict(dummy, save=False, verbose=False)
+            self.warmup_seconds = round(time.perf_counter() - started, 3)
+
+            self._model = model
+            self.state = "ready"
+        except Exception as exc:  # noqa: BLE001
+            self.error = str(exc)
+            self.state = "failed"
+            print(f"✗ Model loading failed: {exc}")
+        finally:
+            self._ready.set()
+
+    def get(self, timeout: Optional[float] = None) -> Any:
+        self.start()
+        if not self._ready.wait(timeout):
+            raise RuntimeError("模型仍在加载中，请稍后重试")
+        if self._model is None:
+            raise RuntimeError(f"模型加载失败: {self.error}")
+        return self._model
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "state": self.state,
+            "runtime": self.runtime,
+            "error": self.error,
+            "load_seconds": self.load_seconds,
+            "warmup_seconds": self.warmup_seconds,
+        }
+
+
+def result_to_detections(result: Any) -> List[Dict[str, object]]:
+    """Convert one ultralytics ``Results`` object to the API detection schema."""
+    detections = []
+    names = result.names
+    boxes = getattr(result, "boxes", None)
+    if boxes is not None:
+        xywh = boxes.xywh.cpu().numpy()
+        cls = boxes.cls.cpu().numpy()
+        confs = boxes.conf.cpu().numpy()
+        for i in range(len(cls)):
+            center_x, center_y, _, _ = xywh[i]
+            target = names.get(int(cls[i]), str(int(cls[i])))
+            detections.append(
+                {
+                    "target": target,
+                    "center": [float(center_x), float(center_y)],
+                    "confidence": float(confs[i]),
+                }
+            )
+    return detections
+
+
+def render_annotated(result: Any) -> bytes:
+    """Render boxes and masks onto the source image and return PNG bytes."""
+    annotated = result.plot()
+    buffer = io.BytesIO()
+    Image.fromarray(annotated).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def predict_batch(
+    model: Any, images: Sequence[np.ndarray], conf: float = 0.25
+) -> List[Tuple[Dict, bytes]]:
+    """Run ``images`` through ``model`` in a single forward pass.
+
+    Returns one ``({"detections": [...]}, annotated_png_bytes)`` pair per input
+    image, in input order.
+    """
+    if not images:
+        return []
+    results = model.predict(list(images), conf=conf, save=False, verbose=False)
+    outputs: List[Tuple[Dict, bytes]] = []
+    for i in range(len(images)):
+        if i >= len(results):
+            outputs.append(({"detections": []}, b""))
+            continue
+        result = results[i]
+        outputs.append(({"detections": result_to_detections(result)}, render_annotated(result)))
+    return outputs
+
+
+def _tile_origins(length: int, tile: int, stride: int) -> List[int]:
+    if length <= tile:
+        return [0]
+    origins = list(range(0, length - tile, stride))
+    origins.append(length - tile)  # last tile flush with the edge
+    return origins
+
+
+def _nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, threshold: float) -> List[int]:
+    """Greedy per-class NMS on xyxy boxes.
+
+    Overlap is measured as intersection over the *smaller* box, so a mirror cut
+    in half by a tile border is suppressed by the complete box from the
+    neighbouring tile even though their IoU is low.
+    """
+    if len(boxes) == 0:
+        return []
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    order = scores.argsort()[::-1]
+    keep: List[int] = []
+    while order.size:
+        i = order[0]
+        keep.append(int(i))
+        rest = order[1:]
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        overlap = inter / np.maximum(np.minimum(areas[i], areas[rest]), 1e-6)
+        suppress = (overlap > threshold) & (classes[rest] == classes[i])
+        order = rest[~suppress]
+    return keep
+
+
+def _render_tiled(
+    image: np.ndarray,
+    boxes: np.ndarray,
+    classes: np.ndarray,
+    scores: np.ndarray,
+    polygons: List[np.ndarray],
+    names: Dict[int, str],
+) -> bytes:
+    base = Image.fromarray(image).convert("RGBA")
+    overlay = Image.new("RGBA", base.size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(overlay)
+    for box, cls_id, score, polygon in zip(boxes, classes, scores, polygons):
+        color = _PALETTE[int(cls_id) % len(_PALETTE)]
+        if len(polygon) >= 3:
+            draw.polygon([tuple(point) for point in polygon.tolist()], fill=color + (90,))
+        draw.rectangle(box.tolist(), outline=color + (255,), width=2)
+        label = f"{names.get(int(cls_id), str(int(cls_id)))} {score:.2f}"
+        draw.text((float(box[0]) + 2, float(box[1]) + 2), label, fill=color + (255,))
+    buffer = io.BytesIO()
+    Image.alpha_composite(base, overlay).convert("RGB").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def predict_tiled(
+    model: Any,
+    image: np.ndarray,
+    conf: float = 0.25,
+    tile_size: int = 640,
+    overlap: float = 0.2,
+    batch_size: int = 8,
+    nms_threshold: float = 0.5,
+) -> Tuple[Dict, bytes]:
+    """Sliced inference for high-resolution frames.
+
+    The frame is cut into overlapping ``tile_size`` squares, the tiles go
+    through the model ``batch_size`` at a time, and boxes and mask polygons
+    are shifted back to frame coordinates and merged with cross-tile NMS.
+    Returns the same ``({"detections": [...]}, annotated_png_bytes)`` pair as
+    :func:`predict_batch`.
+    """
+    height, width = image.shape[:2]
+    stride = max(1, int(tile_size * (1 - overlap)))
+    origins = [
+        (x0, y0)
+        for y0 in _tile_origins(height, tile_size, stride)
+        for x0 in _tile_origins(width, tile_size, stride)
+    ]
+    tiles = [image[y0:y0 + tile_size, x0:x0 + tile_size] for x0, y0 in origins]
+
+    all_boxes: List[np.ndarray] = []
+    all_scores: List[np.ndarray] = []
+    all_classes: List[np.ndarray] = []
+    all_polygons: List[np.ndarray] = []
+    names: Dict[int, str] = {}
+    for start in range(0, len(tiles), max(1, batch_size)):
+        batch = tiles[start:start + batch_size]
+        results = model.predict(batch, conf=conf, save=False, verbose=False)
+        for (x0, y0), result in zip(origins[start:start + batch_size], results):
+            names = result.names
+            boxes = getattr(result, "boxes", None)
+            if boxes is None or len(boxes) == 0:
+                continue
+            offset = np.array([x0, y0, x0, y0], dtype=np.float32)
+            all_boxes.append(boxes.xyxy.cpu().numpy() + offset)
+            all_scores.append(boxes.conf.cpu().numpy())
+            all_classes.append(boxes.cls.cpu().numpy())
+            masks = getattr(result, "masks", None)
+            if masks is not None:
+                all_polygons.extend(poly + np.array([x0, y0], dtype=np.float32) for poly in masks.xy)
+            else:
+                all_polygons.extend(np.empty((0, 2), dtype=np.float32) for _ in range(len(boxes)))
+
+    if not all_boxes:
+        return {"detections": []}, _render_tiled(image, np.empty((0, 4)), np.empty(0), np.empty(0), [], names)
+
+    boxes_xyxy = np.concatenate(all_boxes)
+    scores = np.concatenate(all_scores)
+    classes = np.concatenate(all_classes)
+    keep = _nms(boxes_xyxy, scores, classes, nms_threshold)
+    boxes_xyxy, scores, classes = boxes_xyxy[keep], scores[keep], classes[keep]
+    polygons = [all_polygons[i] for i in keep]
+
+    detections = [
+        {
+            "target": names.get(int(cls_id), str(int(cls_id))),
+            "center": [float((box[0] + box[2]) / 2), float((box[1] + box[3]) / 2)],
+            "confidence": float(score),
+        }
+        for box, score, cls_id in zip(boxes_xyxy, scores, classes)
+    ]
+    return {"detections": detections}, _render_tiled(image, boxes_xyxy, classes, scores, polygons, names)
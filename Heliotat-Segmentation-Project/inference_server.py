@@ -0,0 +1,293 @@
+"""独立推理进程：在进程池中加载多个模型副本，通过本地套接字为 Web 进程提供推理服务。
+
+启动方式::
+
+    python inference_server.py --replicas 2
+
+Flask/gunicorn 进程设置 ``INFERENCE_ADDRESS`` 后不再自行加载模型，而是把解码后的
+图像数组发送到这里，由进程池中的模型副本完成推理并返回检测结果。
+"""
+
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.connection import Client, Connection, Listener
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from batching import MicroBatcher
+from inference import RUNTIMES, load_model, predict_batch, predict_tiled
+
+
+DEFAULT_ADDRESS = os.getenv("INFERENCE_ADDRESS", "inference.sock")
+# No built-in key: connections carry pickles, so a guessable key would let
+# anyone who can reach a TCP listener run code in the inference process.
+DEFAULT_AUTHKEY = os.getenv("INFERENCE_AUTHKEY")
+
+Address = Union[str, Tuple[str, int]]
+
+# Per-replica model, set by _init_replica inside each pool process
+_REPLICA_MODEL: Any = None
+
+
+def parse_address(address: str) -> Address:
+    """``host:port`` becomes a TCP address, anything else a unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def resolve_authkey(address: Address, authkey: Optional[str]) -> Optional[bytes]:
+    """Authkey bytes for ``address``; refuses TCP without an explicit key.
+
+    A unix socket without a key is protected by its file mode (0600) instead.
+    """
+    if authkey:
+        return authkey.encode("utf-8")
+    if isinstance(address, tuple):
+        raise ValueError("INFERENCE_AUTHKEY must be set to use a TCP inference address")
+    return None
+
+
+def _init_replica(weights_path: str, runtime: str, torch_threads: int) -> None:
+    global _REPLICA_MODEL
+    if torch_threads > 0:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    _REPLICA_MODEL = load_model(Path(weights_path), runtime)
+
+
+def _replica_predict(images: List[np.ndarray], conf: float) -> List[Tuple[Dict, bytes]]:
+    return predict_batch(_REPLICA_MODEL, images, conf=conf)
+
+
+def _replica_predict_tiled(image: np.ndarray, conf: float, tile_options: Dict) -> Tuple[Dict, bytes]:
+    return predict_tiled(_REPLICA_MODEL, image, conf=conf, **tile_options)
+
+
+class InferenceServer:
+    """Serve predictions from a pool of model replicas over a local socket."""
+
+    def __init__(
+        self,
+        address: Address,
+        weights_path: Path,
+        replicas: int = 1,
+        runtime: str = "torch",
+        authkey: Optional[str] = DEFAULT_AUTHKEY,
+        max_batch_size: int = 8,
+        max_wait: float = 0.02,
+        torch_threads: int = 0,
+        tile_options: Optional[Dict] = None,
+    ):
+        self.address = address
+        self.authkey = resolve_authkey(address, authkey)
+        self.replicas = max(1, replicas)
+        self.runtime = runtime
+        self.max_batch_size = max(1, max_batch_size)
+        self.tile_options = tile_options or {}
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.replicas,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_replica,
+            initargs=(str(weights_path), runtime, torch_threads),
+        )
+        # Requests from all web workers share one batcher, so images sent by
+        # different gunicorn processes can still land in the same forward pass.
+        self.batcher = MicroBatcher(
+            self._predict_many,
+            max_batch_size=self.max_batch_size,
+            max_wait=max_wait,
+            name="inference-batcher",
+            workers=self.replicas,
+        )
+
+    def _predict_many(self, items: List[Tuple[np.ndarray, float]]) -> List[Tuple[Dict, bytes]]:
+        outputs: List[Tuple[Dict, bytes]] = [({"detections": []}, b"")] * len(items)
+        groups: Dict[float, List[int]] = {}
+        for idx, (_, conf) in enumerate(items):
+            groups.setdefault(conf, []).append(idx)
+        for conf, indices in groups.items():
+            results = self.pool.submit(
+                _replica_predict, [items[i][0] for i in indices], conf
+            ).result()
+            for i, result in zip(indices, results):
+                outputs[i] = result
+        return outputs
+
+    def _handle(self, conn: Connection) -> None:
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    op, images, conf = message
+                    if op == "ping":
+                        conn.send(("ok", {"replicas": self.replicas, "runtime": self.runtime}))
+                        continue
+                    if op == "predict":
+                        futures = [self.batcher.submit_async((image, conf)) for image in images]
+                    elif op == "predict_tiled":
+                        # Tiles of one frame already form a batch; each frame goes to a replica
+                        futures = [
+                            self.pool.submit(_replica_predict_tiled, image, conf, self.tile_options)
+                            for image in images
+                        ]
+                    else:
+                        raise ValueError(f"unknown operation: {op}")
+                    reply: Tuple[str, Any] = ("ok", [future.result() for future in futures])
+                except Exception as exc:  # noqa: BLE001
+                    reply = ("error", str(exc))
+                try:
+                    conn.send(reply)
+                except (EOFError, OSError):
+                    return
+
+    def warmup(self) -> None:
+        """Force every replica to load its model before accepting traffic."""
+        dummy = np.zeros((64, 64, 3), dtype=np.uint8)
+        futures = [
+            self.pool.submit(_replica_predict, [dummy], 0.25) for _ in range(self.replicas)
+        ]
+        for future in futures:
+            future.result()
+
+    def serve_forever(self) -> None:
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        # Create the unix socket as 0600 from the start, not chmod it afterwards
+        umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        with listener:
+            print(f"✓ Inference server listening on {self.address} ({self.replicas} replicas)")
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as exc:
+                    print(f"✗ Rejected inference client: {exc}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+class InferenceClient:
+    """Thread-safe client used by the web workers; one connection per thread."""
+
+    def __init__(self, address: Address, authkey: Optional[str] = DEFAULT_AUTHKEY, timeout: float = 300.0):
+        self.address = address
+        self.authkey = resolve_authkey(address, authkey)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> Connection:
+        conn: Optional[Connection] = getattr(self._local, "conn", None)
+        if conn is None or conn.closed:
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn = conn
+        return conn
+
+    def _reset(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            try:
+                conn.close()
+            except OSError:
+                pass
+        self._local.conn = None
+
+    def ping(self) -> Dict[str, object]:
+        """Check that the server is up; raises if it cannot be reached."""
+        conn = self._connection()
+        try:
+            conn.send(("ping", [], 0.0))
+            if not conn.poll(5.0):
+                raise TimeoutError("inference server did not reply in time")
+            status, payload = conn.recv()
+        except (EOFError, OSError):
+            self._reset()
+            raise
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def predict(
+        self, images: Sequence[np.ndarray], conf: float = 0.25, tiled: bool = False
+    ) -> List[Tuple[Dict, bytes]]:
+        if not images:
+            return []
+        op = "predict_tiled" if tiled else "predict"
+        # Retry once so a restarted inference server does not fail the request
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((op, list(images), conf))
+                if not conn.poll(self.timeout):
+                    self._reset()
+                    raise TimeoutError("inference server did not reply in time")
+                status, payload = conn.recv()
+                break
+            except (EOFError, ConnectionError, BrokenPipeError, FileNotFoundError):
+                self._reset()
+                if attempt:
+                    raise
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Heliostat YOLO-Seg inference server")
+    parser.add_argument("--address", default=DEFAULT_ADDRESS, help="unix socket path or host:port")
+    parser.add_argument("--weights", default="best.pt")
+    parser.add_argument(
+        "--runtime",
+        choices=RUNTIMES,
+        default=os.getenv("INFERENCE_RUNTIME", "torch"),
+        help="torch, or an exported onnx/openvino copy of the weights",
+    )
+    parser.add_argument("--replicas", type=int, default=int(os.getenv("INFERENCE_REPLICAS", "1")))
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("BATCH_MAX_SIZE", "8")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("BATCH_MAX_WAIT_MS", "20")))
+    parser.add_argument(
+        "--torch-threads",
+        type=int,
+        default=int(os.getenv("INFERENCE_TORCH_THREADS", "0")),
+        help="torch intra-op threads per replica (0 = torch default)",
+    )
+    parser.add_argument("--tile-size", type=int, default=int(os.getenv("TILE_SIZE", "640")))
+    parser.add_argument("--tile-overlap", type=float, default=float(os.getenv("TILE_OVERLAP", "0.2")))
+    parser.add_argument("--tile-batch-size", type=int, default=int(os.getenv("TILE_BATCH_SIZE", "8")))
+    args = parser.parse_args()
+
+    server = InferenceServer(
+        parse_address(args.address),
+        Path(args.weights),
+        replicas=args.replicas,
+        runtime=args.runtime,
+        max_batch_size=args.batch_size,
+        max_wait=args.max_wait_ms / 1000,
+        torch_threads=args.torch_threads,
+        tile_options={
+            "tile_size": args.tile_size,
+            "overlap": args.tile_overlap,
+            "batch_size": args.tile_batch_size,
+        },
+    )
+    server.warmup()
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,305 @@
+"""异步推理任务：基于 SQLite 的持久化任务队列与后台工作线程。"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+class JobQueue:
+    """Durable job queue stored in its own SQLite file.
+
+    Every uploaded image becomes one ``job_items`` row. Workers claim items
+    with a lease; items whose lease expires (the worker was killed or timed
+    out) are handed out again, up to ``max_attempts`` times.
+    """
+
+    def __init__(self, db_path: Path, lease_seconds: float = 300.0, max_attempts: int = 3):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._init_schema()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _init_schema(self) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                );
+                CREATE TABLE IF NOT EXISTS job_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL REFERENCES jobs(id),
+                    position INTEGER NOT NULL,
+                    filename TEXT NOT NULL,
+                    image BLOB,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    lease_until REAL,
+                    result TEXT,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_job_items_job ON job_items(job_id, position);
+                CREATE INDEX IF NOT EXISTS idx_job_items_status ON job_items(status, lease_until);
+                """
+            )
+        finally:
+            conn.close()
+
+    def create_job(self, uploads: Sequence[Tuple[str, bytes]]) -> str:
+        job_id = uuid.uuid4().hex
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT INTO jobs (id, status, total) VALUES (?, 'queued', ?)",
+                (job_id, len(uploads)),
+            )
+            conn.executemany(
+                "INSERT INTO job_items (job_id, position, filename, image) VALUES (?, ?, ?, ?)",
+                [
+                    (job_id, position, filename, sqlite3.Binary(image_bytes))
+                    for position, (filename, image_bytes) in enumerate(uploads)
+                ],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return job_id
+
+    def claim(self, limit: int) -> List[sqlite3.Row]:
+        """Lease up to ``limit`` queued (or abandoned) items to the caller."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # Items abandoned too often are given up instead of crashing workers forever
+            exhausted = conn.execute(
+                """
+                SELECT id, job_id FROM job_items
+                WHERE (status = 'queued' OR (status = 'running' AND lease_until < ?))
+                  AND attempts >= ?
+                """,
+                (now, self.max_attempts),
+            ).fetchall()
+            for row in exhausted:
+                self._finish_item(conn, row["id"], row["job_id"], None, "超过最大重试次数")
+            rows = conn.execute(
+                """
+                SELECT id, job_id, position, filename, image FROM job_items
+                WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                ORDER BY id
+                LIMIT ?
+                """,
+                (now, limit),
+            ).fetchall()
+            if rows:
+                ids = [row["id"] for row in rows]
+                marks = ",".join("?" * len(ids))
+                conn.execute(
+                    f"""
+                    UPDATE job_items
+                    SET status = 'running', attempts = attempts + 1, lease_until = ?
+                    WHERE id IN ({marks})
+                    """,
+                    [now + self.lease_seconds, *ids],
+                )
+                job_ids = sorted({row["job_id"] for row in rows})
+                conn.execute(
+                    f"""
+                    UPDATE jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP
+                    WHERE status = 'queued' AND id IN ({",".join("?" * len(job_ids))})
+                    """,
+                    job_ids,
+                )
+            conn.execute("COMMIT")
+            return rows
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _finish_item(
+        self,
+        conn: sqlite3.Connection,
+        item_id: int,
+        job_id: str,
+        result: Optional[Dict[str, object]],
+        error: Optional[str],
+    ) -> None:
+        cursor = conn.execute(
+            """
+            UPDATE job_items
+            SET status = ?, result = ?, error = ?, image = NULL, lease_until = NULL
+            WHERE id = ? AND status != 'done' AND status != 'error'
+            """,
+            (
+                "error" if error else "done",
+                json.dumps(result, ensure_ascii=False) if result is not None else None,
+                error,
+                item_id,
+            ),
+        )
+        if cursor.rowcount == 0:
+            return
+        column = "failed" if error else "completed"
+        conn.execute(
+            f"""
+            UPDATE jobs
+            SET {column} = {column} + 1,
+                status = CASE WHEN completed + failed + 1 >= total THEN 'finished' ELSE status END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (job_id,),
+        )
+
+    def finish(self, item: sqlite3.Row, result: Optional[Dict[str, object]], error: Optional[str] = None) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            self._finish_item(conn, item["id"], item["job_id"], result, error)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def release(self, items: Sequence[sqlite3.Row]) -> None:
+        """Hand claimed items back to the queue immediately (e.g. after a transient error)."""
+        if not items:
+            return
+        conn = self._connect()
+        try:
+            conn.executemany(
+                "UPDATE job_items SET status = 'queued', lease_until = NULL WHERE id = ? AND status = 'running'",
+                [(item["id"],) for item in items],
+            )
+        finally:
+            conn.close()
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, object]]:
+        conn = self._connect()
+        try:
+            job = conn.execute(
+                "SELECT id, status, total, completed, failed, created_at, updated_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+            if job is None:
+                return None
+            items = conn.execute(
+                """
+                SELECT position, filename, status, result, error
+                FROM job_items WHERE job_id = ? ORDER BY position
+                """,
+                (job_id,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+        results = []
+        for item in items:
+            entry: Dict[str, object] = {"filename": item["filename"], "status": item["status"]}
+            if item["result"]:
+                entry.update(json.loads(item["result"]))
+            if item["error"]:
+                entry["error"] = item["error"]
+            results.append(entry)
+        done = job["completed"] + job["failed"]
+        return {
+            "job_id": job["id"],
+            "status": job["status"],
+            "total": job["total"],
+            "completed": job["completed"],
+            "failed": job["failed"],
+            "progress": round(done / job["total"], 4) if job["total"] else 1.0,
+            "created_at": job["created_at"],
+            "updated_at": job["updated_at"],
+            "results": results,
+        }
+
+
+class JobWorker:
+    """Background thread that drains ``JobQueue`` in batches.
+
+    ``handler`` receives ``[(filename, image_bytes), ...]`` and returns one
+    result dict per upload; a dict containing ``"error"`` marks the item failed.
+    """
+
+    def __init__(
+        self,
+        job_queue: JobQueue,
+        handler: Callable[[List[Tuple[str, bytes]]], List[Dict[str, object]]],
+        batch_size: int = 8,
+        poll_interval: float = 1.0,
+    ):
+        self.queue = job_queue
+        self.handler = handler
+        self.batch_size = max(1, batch_size)
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"job-worker-{os.getpid()}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def notify(self) -> None:
+        """Wake the worker right away instead of waiting for the next poll."""
+        self._wakeup.set()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                worked = self._step()
+            except Exception as exc:  # noqa: BLE001
+                # Never let the thread die: unfinished items come back when their lease expires
+                print(f"✗ Job worker error: {exc}")
+                time.sleep(self.poll_interval)
+                continue
+            if not worked:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+
+    def _step(self) -> bool:
+        """Claim and process one batch; ``False`` when the queue was empty."""
+        items = self.queue.claim(self.batch_size)
+        if not items:
+            return False
+        try:
+            results = self.handler([(item["filename"], item["image"]) for item in items])
+        except Exception as exc:  # noqa: BLE001
+            print(f"✗ Job batch failed, releasing {len(items)} items: {exc}")
+            self.queue.release(items)
+            time.sleep(self.poll_interval)
+            return True
+        for item, result in zip(items, results):
+            if "error" in result:
+                self.queue.finish(item, None, str(result["error"]))
+            else:
+                self.queue.finish(item, result)
+        return True
@@ -0,0 +1,209 @@
+"""SQLite 维护任务：按保留策略清理标注图像，把过期历史归档为按月压缩的 NDJSON，并增量回收空间。
+
+后端进程会启动一个后台维护线程（``MAINTENANCE_INTERVAL``）；也可以手动执行::
+
+    python maintenance.py --once     # 立即执行一轮维护
+    python maintenance.py --vacuum   # 把旧数据库一次性切换为 auto_vacuum=INCREMENTAL（会锁库，需停服执行）
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from blob_store import AnnotatedImageStore
+from database import ResultRepository
+
+
+def _utc_cutoff(days: float) -> str:
+    """Cutoff in the format SQLite's CURRENT_TIMESTAMP writes (UTC)."""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class RetentionPolicy:
+    """What to keep. A value of 0 days disables that rule."""
+
+    def __init__(
+        self,
+        annotated_days: float = 0,
+        history_days: float = 0,
+        archive_dir: Path = Path("archive"),
+        vacuum_pages: int = 2000,
+    ):
+        self.annotated_days = annotated_days
+        self.history_days = history_days
+        self.archive_dir = archive_dir
+        self.vacuum_pages = vacuum_pages
+
+    @classmethod
+    def from_env(cls) -> "RetentionPolicy":
+        return cls(
+            annotated_days=float(os.getenv("RETENTION_ANNOTATED_DAYS", "0")),
+            history_days=float(os.getenv("RETENTION_HISTORY_DAYS", "0")),
+            archive_dir=Path(os.getenv("ARCHIVE_DIR", "archive")),
+            vacuum_pages=int(os.getenv("VACUUM_PAGES", "2000")),
+        )
+
+
+def archive_path(archive_dir: Path, created_at: str) -> Path:
+    return archive_dir / f"history-{created_at[:7]}.ndjson.gz"
+
+
+def _append_archive(path: Path, records: List[Dict]) -> None:
+    """Append one gzip member; concatenated members read back as a single stream."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for record in records:
+                gz.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def archive_history(
+    repository: ResultRepository,
+    store: Optional[AnnotatedImageStore],
+    cutoff: str,
+    archive_dir: Path,
+    batch_size: int = 1000,
+) -> int:
+    """Move images created before ``cutoff`` into monthly archives; returns the image count.
+
+    Each batch is written and fsynced before its rows are deleted, so a crash
+    in between at worst archives the batch twice, never loses it.
+    """
+    archived = 0
+    while True:
+        images = repository.images_before(cutoff, batch_size)
+        if not images:
+            return archived
+        image_ids = [row["id"] for row in images]
+        by_month: Dict[Path, List[Dict]] = {}
+        hashes = set()
+        for row in repository.archive_rows(image_ids):
+            by_month.setdefault(archive_path(archive_dir, row["created_at"]), []).append(
+                {
+                    "time": row["created_at"],
+                    "filename": row["filename"],
+                    "file_hash": row["file_hash"],
+                    "target": row["target"],
+                    "center_x": row["center_x"],
+                    "center_y": row["center_y"],
+                    "confidence": row["confidence"],
+                }
+            )
+            if row["file_hash"]:
+                hashes.add(row["file_hash"])
+        for path, records in by_month.items():
+            _append_archive(path, records)
+        repository.delete_images(image_ids)
+        if store is not None:
+            for file_hash in hashes:
+                store.delete(file_hash)
+        archived += len(image_ids)
+
+
+class Maintainer:
+    """Background thread applying a ``RetentionPolicy`` every ``interval`` seconds.
+
+    Every gunicorn worker starts one; a lock file lets only one of them run a
+    cycle at a time and the others skip it.
+    """
+
+    def __init__(
+        self,
+        repository: ResultRepository,
+        store: Optional[AnnotatedImageStore],
+        policy: RetentionPolicy,
+        interval: float = 3600.0,
+    ):
+        self.repository = repository
+        self.store = store
+        self.policy = policy
+        self.interval = interval
+        self.lock_path = repository.db_path.with_name(f".{repository.db_path.name}.maintenance.lock")
+        self.last_run: Optional[Dict[str, object]] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"maintenance-{os.getpid()}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def run_once(self) -> Optional[Dict[str, object]]:
+        """Run one cycle; returns a summary, or ``None`` if another process holds the lock."""
+        import fcntl
+
+        with open(self.lock_path, "w") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            summary: Dict[str, object] = {"annotated_pruned": 0, "legacy_pruned": 0, "images_archived": 0}
+            if self.policy.annotated_days > 0:
+                if self.store is not None:
+                    summary["annotated_pruned"] = self.store.prune(self.policy.annotated_days)
+                summary["legacy_pruned"] = self.repository.delete_legacy_annotated_before(
+                    _utc_cutoff(self.policy.annotated_days)
+                )
+            if self.policy.history_days > 0:
+                summary["images_archived"] = archive_history(
+                    self.repository,
+                    self.store,
+                    _utc_cutoff(self.policy.history_days),
+                    self.policy.archive_dir,
+                )
+            summary["pages_freed"] = self.repository.incremental_vacuum(self.policy.vacuum_pages)
+            summary.update(self.repository.storage_stats())
+            summary["finished_at"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            self.last_run = summary
+            return summary
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                summary = self.run_once()
+            except Exception as exc:  # noqa: BLE001
+                print(f"✗ Maintenance failed: {exc}")
+                continue
+            if summary and (summary["annotated_pruned"] or summary["images_archived"] or summary["pages_freed"]):
+                print(
+                    f"✓ Maintenance: {summary['images_archived']} images archived, "
+                    f"{summary['annotated_pruned']} annotated PNGs pruned, {summary['pages_freed']} pages freed"
+                )
+            # Drop this thread's connection between cycles
+            self.repository.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Retention and compaction for classification_results.db")
+    parser.add_argument("--db", type=Path, default=Path("classification_results.db"))
+    parser.add_argument("--annotated-dir", type=Path, default=Path("annotated_images"))
+    parser.add_argument("--once", action="store_true", help="run one maintenance cycle with the env policy")
+    parser.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="switch an existing database to auto_vacuum=INCREMENTAL (full VACUUM, stop the backend first)",
+    )
+    args = parser.parse_args()
+
+    repository = ResultRepository(args.db)
+    if args.vacuum:
+        before = repository.storage_stats()["file_bytes"]
+        repository.enable_incremental_vacuum()
+        print(f"✓ VACUUM done: {before} -> {repository.storage_stats()['file_bytes']} bytes")
+    if args.once or not args.vacuum:
+        maintainer = Maintainer(repository, AnnotatedImageStore(args.annotated_dir), RetentionPolicy.from_env())
+        print(json.dumps(maintainer.run_once(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
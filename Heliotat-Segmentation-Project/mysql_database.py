@@ -3,17 +3,160 @@
 from __future__ import annotations
 
 import os
-from typing import Dict, List, Optional, Any
+import threading
+import time
+from datetime import date, datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Any
 from contextlib import contextmanager
 
+from streaming import chunked
+
 try:
     import mysql.connector
+    import mysql.connector.pooling
     from mysql.connector import Error as MySQLError
     MYSQL_AVAILABLE = True
 except ImportError:
     MYSQL_AVAILABLE = False
     MySQLError = Exception
 
+# Cleanliness below this counts as "needs cleaning" on the dashboard
+DIRTY_THRESHOLD = 0.75
+
+# Dashboard summary from the rollup tables created by mysql_migrate.py (004);
+# every subquery reads at most a few days/one month of rollup rows.
+DASHBOARD_ROLLUP_QUERY = """
+    SELECT
+        (SELECT COUNT(*) FROM heliostat_info) AS total,
+        (SELECT SUM(cleanliness_sum) / NULLIF(SUM(cleanliness_count), 0)
+            FROM inspection_daily_stats
+            WHERE day > CURDATE() - INTERVAL 7 DAY) AS avg_cleanliness,
+        (SELECT COUNT(DISTINCT heliostat_id)
+            FROM inspection_daily_dirty
+            WHERE day > CURDATE() - INTERVAL 7 DAY AND dirty_count > 0) AS need_cleaning,
+        (SELECT COUNT(*)
+            FROM inspection_monthly_flights
+            WHERE month = DATE_FORMAT(CURDATE(), '%Y-%m-01') AND inspection_count > 0) AS flight_count,
+        (SELECT MAX(`时间戳`) FROM inspection_records) AS last_inspection
+"""
+
+
+def _cleanliness_rollup_rebuild(table: str, bucket: str) -> Tuple[str, str]:
+    """Rebuild statement for a cleanliness time-series table; zone '*' is the whole field."""
+    return (
+        table,
+        f"""
+        INSERT INTO {table}
+            (bucket, zone, sample_count, cleanliness_sum, cleanliness_min, cleanliness_max)
+        SELECT {bucket}, '*', COUNT(*), SUM(ir.`清洁度分析值`), MIN(ir.`清洁度分析值`), MAX(ir.`清洁度分析值`)
+        FROM inspection_records ir
+        WHERE ir.`时间戳` IS NOT NULL AND ir.`清洁度分析值` IS NOT NULL
+        GROUP BY 1
+        UNION ALL
+        SELECT {bucket}, hi.`区号`, COUNT(*), SUM(ir.`清洁度分析值`), MIN(ir.`清洁度分析值`), MAX(ir.`清洁度分析值`)
+        FROM inspection_records ir
+        JOIN heliostat_info hi ON hi.`定日镜序号` = ir.`定日镜序号`
+        WHERE ir.`时间戳` IS NOT NULL AND ir.`清洁度分析值` IS NOT NULL AND hi.`区号` IS NOT NULL
+        GROUP BY 1, 2
+        """,
+    )
+
+
+# (table, INSERT ... SELECT) pairs used to rebuild the trigger-maintained tables from scratch
+ROLLUP_REBUILD = [
+    (
+        "inspection_daily_stats",
+        """
+        INSERT INTO inspection_daily_stats (day, inspection_count, cleanliness_sum, cleanliness_count)
+        SELECT DATE(`时间戳`), COUNT(*), IFNULL(SUM(`清洁度分析值`), 0), COUNT(`清洁度分析值`)
+        FROM inspection_records
+        WHERE `时间戳` IS NOT NULL
+        GROUP BY DATE(`时间戳`)
+        """,
+    ),
+    (
+        "inspection_daily_dirty",
+        f"""
+        INSERT INTO inspection_daily_dirty (day, heliostat_id, dirty_count)
+        SELECT DATE(`时间戳`), `定日镜序号`, COUNT(*)
+        FROM inspection_records
+        WHERE `时间戳` IS NOT NULL AND `定日镜序号` IS NOT NULL AND `清洁度分析值` < {DIRTY_THRESHOLD}
+        GROUP BY DATE(`时间戳`), `定日镜序号`
+        """,
+    ),
+    (
+        "inspection_monthly_flights",
+        """
+        INSERT INTO inspection_monthly_flights (month, flight_id, inspection_count)
+        SELECT DATE_FORMAT(`时间戳`, '%Y-%m-01'), `飞行记录序号`, COUNT(*)
+        FROM inspection_records
+        WHERE `时间戳` IS NOT NULL AND `飞行记录序号` IS NOT NULL
+        GROUP BY DATE_FORMAT(`时间戳`, '%Y-%m-01'), `飞行记录序号`
+        """,
+    ),
+    (
+        "heliostat_latest_state",
+        """
+        INSERT INTO heliostat_latest_state
+            (heliostat_id, inspection_id, cleanliness, confidence, inspected_at, flight_id)
+        SELECT heliostat_id, inspection_id, cleanliness, confidence, inspected_at, flight_id
+        FROM (
+            SELECT
+                `定日镜序号` AS heliostat_id,
+                `检查序号` AS inspection_id,
+                `清洁度分析值` AS cleanliness,
+                `置信度` AS confidence,
+                `时间戳` AS inspected_at,
+                `飞行记录序号` AS flight_id,
+                ROW_NUMBER() OVER (PARTITION BY `定日镜序号` ORDER BY `时间戳` DESC, `检查序号` DESC) AS rn
+            FROM inspection_records
+            WHERE `定日镜序号` IS NOT NULL AND `时间戳` IS NOT NULL
+        ) ranked
+        WHERE rn = 1
+        """,
+    ),
+    _cleanliness_rollup_rebuild("cleanliness_daily", "DATE(ir.`时间戳`)"),
+    _cleanliness_rollup_rebuild("cleanliness_hourly", "DATE_FORMAT(ir.`时间戳`, '%Y-%m-%d %H:00:00')"),
+]
+
+# Granularity -> cleanliness time-series table (mysql_migrate.py step 006)
+CLEANLINESS_TABLES = {"day": "cleanliness_daily", "hour": "cleanliness_hourly"}
+
+DASHBOARD_ROLLUP_TABLES = ("inspection_daily_stats", "inspection_daily_dirty", "inspection_monthly_flights")
+
+LATEST_STATE_COLUMNS = """
+    ls.heliostat_id,
+    ls.inspection_id,
+    ls.cleanliness,
+    ls.confidence,
+    ls.inspected_at AS timestamp,
+    ls.flight_id
+"""
+
+
+HELIOSTAT_QUERY = """
+    SELECT
+        `定日镜序号` as id,
+        `Y_东坐标` as y_coord,
+        `X_北坐标` as x_coord,
+        `标高` as elevation,
+        `环号` as ring,
+        `列号` as column_num,
+        `区号` as zone
+    FROM heliostat_info
+"""
+
+
+def _iso_row(row: Optional[Dict]) -> Optional[Dict]:
+    """Render DATETIME values (``mysql_migrate.py`` converts 时间戳) as the ISO strings the API always returned."""
+    if row is None:
+        return None
+    return {key: value.isoformat() if isinstance(value, (date, datetime)) else value for key, value in row.items()}
+
+
+def _iso_rows(rows: List[Dict]) -> List[Dict]:
+    return [_iso_row(row) for row in rows]
+
 
 class MySQLRepository:
     """MySQL database repository for solar_heliostat data."""
@@ -25,34 +168,125 @@ class MySQLRepository:
         user: str = None,
         password: str = None,
         database: str = None,
+        pool_size: int = None,
+        pool_timeout: float = None,
     ):
         self.host = host or os.getenv("MYSQL_HOST", "127.0.0.1")
         self.port = port or int(os.getenv("MYSQL_PORT", "3306"))
         self.user = user or os.getenv("MYSQL_USER", "root")
         self.password = password or os.getenv("MYSQL_PASSWORD", "")
         self.database = database or os.getenv("MYSQL_DATABASE", "solar_heliostat")
-        self._connection = None
+        # Per web worker process; mysql-connector caps a pool at 32 connections
+        self.pool_size = max(1, min(32, pool_size or int(os.getenv("MYSQL_POOL_SIZE", "5"))))
+        self.pool_timeout = pool_timeout or float(os.getenv("MYSQL_POOL_TIMEOUT", "5"))
+        self._pool = None
+        self._pool_pid: Optional[int] = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        # Rollup table -> (exists, monotonic time of the check)
+        self._rollup_tables: Dict[str, Tuple[bool, float]] = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "in_use": 0, "checkouts": 0, "waits": 0, "wait_ms": 0.0, "timeouts": 0, "errors": 0, "retries": 0,
+        }
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._stats_lock:
+            self._stats[key] += amount
+
+    def _get_pool(self):
+        # A forked gunicorn worker must not share its parent's sockets
+        if self._pool is None or self._pool_pid != os.getpid():
+            with self._pool_lock:
+                if self._pool is None or self._pool_pid != os.getpid():
+                    self._slots = threading.BoundedSemaphore(self.pool_size)
+                    self._stats["in_use"] = 0
+                    self._pool = mysql.connector.pooling.MySQLConnectionPool(
+                        pool_name=f"heliostat_{os.getpid()}",
+                        pool_size=self.pool_size,
+                        pool_reset_session=True,
+                        host=self.host,
+                        port=self.port,
+                        user=self.user,
+                        password=self.password,
+                        database=self.database,
+                        charset="utf8mb4",
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _checkout(self):
+        """Borrow a pooled connection, waiting up to ``pool_timeout`` for a free one.
+
+        The pool pings the connection on checkout and reconnects it if the
+        server dropped it (wait_timeout, restart); a reconnect that fails is
+        retried once before giving up.
+        """
+        pool = self._get_pool()
+        start = time.perf_counter()
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=self.pool_timeout):
+                self._count("timeouts")
+                raise TimeoutError(f"no MySQL connection free within {self.pool_timeout}s")
+            self._count("wait_ms", (time.perf_counter() - start) * 1000)
+        try:
+            try:
+                conn = pool.get_connection()
+            except (mysql.connector.errors.InterfaceError, mysql.connector.errors.OperationalError):
+                self._count("retries")
+                conn = pool.get_connection()
+        except Exception:
+            self._count("errors")
+            self._slots.release()
+            raise
+        self._count("checkouts")
+        self._count("in_use")
+        return conn
+
+    def _checkin(self, conn, discard: bool = False) -> None:
+        """Return a connection to the pool; ``discard`` closes its socket first.
+
+        A discarded connection goes back to the pool disconnected, and the
+        pool reconnects it on the next checkout.
+        """
+        try:
+            if discard:
+                conn.disconnect()
+                conn.unread_result = False
+                try:
+                    conn.close()
+                except mysql.connector.Error:
+                    pass  # resetting the closed session fails, but the pool has it back
+                return
+            if conn.unread_result:
+                conn.consume_results()
+            conn.close()  # returns it to the pool and resets the session
+        except Exception as e:
+            self._count("errors")
+            print(f"Error returning MySQL connection to pool: {e}")
+        finally:
+            self._count("in_use", -1)
+            self._slots.release()
 
     @contextmanager
     def _connect(self):
-        """Context manager for database connections."""
+        """Context manager lending a pooled connection for the duration of the block."""
         if not MYSQL_AVAILABLE:
             raise ImportError("mysql-connector-python is not installed. Run: pip install mysql-connector-python")
 
-        conn = None
+        conn = self._checkout()
         try:
-            conn = mysql.connector.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset="utf8mb4",
-            )
             yield conn
         finally:
-            if conn and conn.is_connected():
-                conn.close()
+            self._checkin(conn)
+
+    def pool_stats(self) -> Dict[str, Any]:
+        """Pool size, connections currently lent out and checkout counters for this process."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["wait_ms"] = round(stats["wait_ms"], 1)
+        return {"size": self.pool_size, "timeout": self.pool_timeout, **stats}
 
     def test_connection(self) -> Dict[str, Any]:
         """Test database connection."""
@@ -66,21 +300,39 @@ class MySQLRepository:
         except Exception as e:
             return {"success": False, "error": str(e)}
 
+    def _iter_query(self, query: str, params: tuple = (), batch_size: int = 5000) -> Iterator[Dict]:
+        """Yield the rows of ``query``, ``batch_size`` rows per fetch.
+
+        Uses an unbuffered cursor so the result set is streamed from the
+        server instead of being loaded into memory; the pooled connection is
+        held until the iterator is exhausted or closed. Errors are re-raised
+        since a partial listing must not look complete.
+        """
+        if not MYSQL_AVAILABLE:
+            raise ImportError("mysql-connector-python is not installed. Run: pip install mysql-connector-python")
+
+        conn = self._checkout()
+        finished = False
+        try:
+            cursor = conn.cursor(dictionary=True, buffered=False)
+            cursor.execute(query, params or None)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield from _iso_rows(rows)
+            cursor.close()
+            finished = True
+        finally:
+            # An abandoned download (client gone) or an error leaves the rest of
+            # the result unread; dropping the connection is cheaper than reading it
+            self._checkin(conn, discard=not finished)
+
     # ==================== Heliostat Info ====================
 
     def get_all_heliostats(self, limit: int = None) -> List[Dict]:
         """Get all heliostat information."""
-        query = """
-            SELECT
-                `定日镜序号` as id,
-                `Y_东坐标` as y_coord,
-                `X_北坐标` as x_coord,
-                `标高` as elevation,
-                `环号` as ring,
-                `列号` as column_num,
-                `区号` as zone
-            FROM heliostat_info
-        """
+        query = HELIOSTAT_QUERY
         if limit:
             query += f" LIMIT {limit}"
 
@@ -88,13 +340,26 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query)
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
             print(f"Error fetching heliostats: {e}")
             return []
 
+    def iter_heliostats(self, limit: int = None, batch_size: int = 5000) -> Iterator[Dict]:
+        """Streaming variant of ``get_all_heliostats``, in heliostat id order."""
+        query = HELIOSTAT_QUERY + " ORDER BY `定日镜序号`"
+        params: tuple = ()
+        if limit:
+            query += " LIMIT %s"
+            params = (limit,)
+        try:
+            yield from self._iter_query(query, params, batch_size)
+        except Exception as e:
+            print(f"Error streaming heliostats: {e}")
+            raise
+
     def get_heliostats_by_zone(self, zone: str) -> List[Dict]:
         """Get heliostats by zone."""
         query = """
@@ -113,7 +378,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, (zone,))
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
@@ -134,7 +399,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query)
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
@@ -159,7 +424,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, (limit,))
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
@@ -181,7 +446,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, (flight_id,))
-                result = cursor.fetchone()
+                result = _iso_row(cursor.fetchone())
                 cursor.close()
                 return result
         except Exception as e:
@@ -209,13 +474,97 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, (limit,))
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
             print(f"Error fetching inspection records: {e}")
             return []
 
+    def iter_inspection_records(
+        self, batch_size: int = 5000, limit: int = None, newest_first: bool = False
+    ) -> Iterator[Dict]:
+        """Yield inspection records with their zone, ``batch_size`` rows per fetch.
+
+        In ``检查序号`` order by default (the full export); ``newest_first``
+        matches ``get_inspection_records``.
+        """
+        query = """
+            SELECT
+                ir.`检查序号` as id,
+                ir.`定日镜序号` as heliostat_id,
+                hi.`区号` as zone,
+                ir.`图片路径` as image_path,
+                ir.`清洁度分析值` as cleanliness,
+                ir.`置信度` as confidence,
+                ir.`时间戳` as timestamp,
+                ir.`飞行记录序号` as flight_id
+            FROM inspection_records ir
+            LEFT JOIN heliostat_info hi ON ir.`定日镜序号` = hi.`定日镜序号`
+        """
+        query += " ORDER BY ir.`时间戳` DESC" if newest_first else " ORDER BY ir.`检查序号`"
+        params: tuple = ()
+        if limit:
+            query += " LIMIT %s"
+            params = (limit,)
+        try:
+            yield from self._iter_query(query, params, batch_size)
+        except Exception as e:
+            print(f"Error streaming inspection records: {e}")
+            raise
+
+    def bulk_insert_inspections(self, records: Iterable[Dict], chunk_size: int = 1000) -> Dict[str, Any]:
+        """Insert inspection records, one multi-row INSERT and commit per ``chunk_size`` rows.
+
+        Records use the API field names (``heliostat_id``, ``image_path``,
+        ``cleanliness``, ``confidence``, ``timestamp``, ``flight_id`` and an
+        optional ``id``; without it 检查序号 comes from AUTO_INCREMENT, which
+        mysql_migrate.py adds). The insert triggers keep the rollups and
+        heliostat_latest_state current. On an error the failing chunk is
+        rolled back and earlier chunks stay committed, so ``inserted`` tells
+        the caller where to resume.
+        """
+        query = """
+            INSERT INTO inspection_records
+                (`检查序号`, `定日镜序号`, `图片路径`, `清洁度分析值`, `置信度`, `时间戳`, `飞行记录序号`)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """
+        inserted = 0
+        chunks = 0
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                try:
+                    for chunk in chunked(records, chunk_size):
+                        # executemany rewrites this into a single INSERT ... VALUES (...), (...)
+                        cursor.executemany(
+                            query,
+                            [
+                                (
+                                    r.get("id"),
+                                    r["heliostat_id"],
+                                    r.get("image_path"),
+                                    r.get("cleanliness"),
+                                    r.get("confidence"),
+                                    r.get("timestamp"),
+                                    r.get("flight_id"),
+                                )
+                                for r in chunk
+                            ],
+                        )
+                        conn.commit()
+                        inserted += len(chunk)
+                        chunks += 1
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+            return {"inserted": inserted, "chunks": chunks}
+        except Exception as e:
+            print(f"Error bulk inserting inspection records: {e}")
+            return {"inserted": inserted, "chunks": chunks, "error": str(e)}
+
     def get_inspection_by_flight(self, flight_id: int) -> List[Dict]:
         """Get inspection records for a specific flight."""
         query = """
@@ -236,7 +585,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, (flight_id,))
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
@@ -262,13 +611,58 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, (heliostat_id, limit))
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
             print(f"Error fetching inspection by heliostat: {e}")
             return []
 
+    def get_inspections_by_heliostats(self, heliostat_ids: List[int], limit: int = 10) -> Optional[Dict[int, List[Dict]]]:
+        """Newest ``limit`` inspections of each heliostat, grouped by heliostat id.
+
+        One query for all ids: ROW_NUMBER() ranks each heliostat's rows
+        (read through idx_heliostat_time) and the outer query keeps the top
+        ``limit``. Ids without inspections map to an empty list; returns
+        ``None`` if the query fails, so callers can tell it from no data.
+        """
+        ids = list(dict.fromkeys(int(i) for i in heliostat_ids))
+        grouped: Dict[int, List[Dict]] = {i: [] for i in ids}
+        if not ids:
+            return grouped
+        placeholders = ", ".join(["%s"] * len(ids))
+        query = f"""
+            SELECT id, heliostat_id, image_path, cleanliness, confidence, timestamp, flight_id
+            FROM (
+                SELECT
+                    `检查序号` as id,
+                    `定日镜序号` as heliostat_id,
+                    `图片路径` as image_path,
+                    `清洁度分析值` as cleanliness,
+                    `置信度` as confidence,
+                    `时间戳` as timestamp,
+                    `飞行记录序号` as flight_id,
+                    ROW_NUMBER() OVER (
+                        PARTITION BY `定日镜序号` ORDER BY `时间戳` DESC, `检查序号` DESC
+                    ) as rn
+                FROM inspection_records
+                WHERE `定日镜序号` IN ({placeholders})
+            ) ranked
+            WHERE rn <= %s
+            ORDER BY heliostat_id, rn
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(query, (*ids, limit))
+                for row in _iso_rows(cursor.fetchall()):
+                    grouped[row.pop("heliostat_id")].append(row)
+                cursor.close()
+                return grouped
+        except Exception as e:
+            print(f"Error fetching inspections by heliostats: {e}")
+            return None
+
     def get_latest_cleanliness_by_zone(self) -> List[Dict]:
         """Get latest average cleanliness by zone."""
         query = """
@@ -288,15 +682,142 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query)
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
             print(f"Error fetching cleanliness by zone: {e}")
             return []
 
+    def get_cleanliness_history(self, days: int = 30, zone: str = None, granularity: str = "day") -> List[Dict]:
+        """Average/min/max cleanliness per day (or hour) over the last ``days`` calendar days.
+
+        One primary-key range read of the rollup tables that
+        ``mysql_migrate.py`` (step 006) keeps current; databases that have not
+        been migrated yet aggregate inspection_records directly. ``zone=None``
+        is the whole field.
+        """
+        table = CLEANLINESS_TABLES[granularity]
+        if not self._rollups_available(table):
+            return self._get_cleanliness_history_scan(days, zone, granularity)
+        query = f"""
+            SELECT
+                bucket,
+                sample_count as count,
+                cleanliness_sum / sample_count as avg_cleanliness,
+                cleanliness_min as min_cleanliness,
+                cleanliness_max as max_cleanliness
+            FROM {table}
+            WHERE zone = %s AND bucket >= CURDATE() - INTERVAL %s DAY AND sample_count > 0
+            ORDER BY bucket
+        """
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(query, (zone or "*", days - 1))
+                results = _iso_rows(cursor.fetchall())
+                cursor.close()
+                return results
+        except Exception as e:
+            print(f"Error reading cleanliness rollups, scanning inspection_records: {e}")
+            self._rollup_tables[table] = (False, time.monotonic())
+            return self._get_cleanliness_history_scan(days, zone, granularity)
+
+    def _get_cleanliness_history_scan(self, days: int, zone: str = None, granularity: str = "day") -> List[Dict]:
+        """Cleanliness history aggregated from inspection_records (range read on idx_time)."""
+        if granularity == "day":
+            bucket = "DATE(ir.`时间戳`)"
+        else:
+            bucket = "DATE_FORMAT(ir.`时间戳`, '%%Y-%%m-%%d %%H:00:00')"
+        join = "JOIN heliostat_info hi ON hi.`定日镜序号` = ir.`定日镜序号` AND hi.`区号` = %s" if zone else ""
+        query = f"""
+            SELECT
+                {bucket} as bucket,
+                COUNT(*) as count,
+                AVG(ir.`清洁度分析值`) as avg_cleanliness,
+                MIN(ir.`清洁度分析值`) as min_cleanliness,
+                MAX(ir.`清洁度分析值`) as max_cleanliness
+            FROM inspection_records ir
+            {join}
+            WHERE ir.`时间戳` >= CURDATE() - INTERVAL %s DAY AND ir.`清洁度分析值` IS NOT NULL
+            GROUP BY 1
+            ORDER BY 1
+        """
+        params = (zone, days - 1) if zone else (days - 1,)
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(query, params)
+                results = _iso_rows(cursor.fetchall())
+                cursor.close()
+                return results
+        except Exception as e:
+            print(f"Error fetching cleanliness history: {e}")
+            return []
+
     def get_dashboard_stats(self) -> Dict:
-        """Get dashboard statistics."""
+        """Get dashboard statistics.
+
+        Answered by one statement over the rollup tables that
+        ``mysql_migrate.py`` (step 004) keeps current with triggers; databases
+        that have not been migrated yet use the original per-widget scans.
+        "Recent" means the last 7 calendar days including today.
+        """
+        if self._rollups_available():
+            try:
+                with self._connect() as conn:
+                    cursor = conn.cursor(dictionary=True)
+                    cursor.execute(DASHBOARD_ROLLUP_QUERY)
+                    row = cursor.fetchone()
+                    cursor.close()
+                    return self._dashboard_payload(
+                        row["total"],
+                        row["avg_cleanliness"],
+                        row["need_cleaning"],
+                        row["flight_count"],
+                        row["last_inspection"],
+                    )
+            except Exception as e:
+                print(f"Error reading dashboard rollups, scanning inspection_records: {e}")
+                self._rollup_tables["inspection_daily_stats"] = (False, time.monotonic())
+        return self._get_dashboard_stats_scan()
+
+    def _rollups_available(self, table: str = "inspection_daily_stats") -> bool:
+        # A negative answer is re-checked every few minutes so running the
+        # migration does not need a backend restart.
+        exists, checked_at = self._rollup_tables.get(table, (False, float("-inf")))
+        if exists or time.monotonic() - checked_at < 300:
+            return exists
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    """
+                    SELECT COUNT(*) FROM information_schema.TABLES
+                    WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+                    """,
+                    (table,),
+                )
+                exists = cursor.fetchone()[0] == 1
+                cursor.close()
+        except Exception as e:
+            print(f"Error checking rollup table {table}: {e}")
+            exists = False
+        self._rollup_tables[table] = (exists, time.monotonic())
+        return exists
+
+    @staticmethod
+    def _dashboard_payload(total, avg_cleanliness, need_cleaning, inspections, last) -> Dict:
+        return {
+            "total_mirrors": total,
+            "avg_cleanliness": round(float(avg_cleanliness) * 100, 1) if avg_cleanliness else 0,
+            "mirrors_need_cleaning": need_cleaning or 0,
+            "inspections_this_month": inspections or 0,
+            "last_inspection": last.isoformat() if isinstance(last, datetime) else last,
+        }
+
+    def _get_dashboard_stats_scan(self) -> Dict:
+        """Dashboard statistics computed directly from inspection_records."""
         try:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
@@ -340,17 +861,80 @@ class MySQLRepository:
 
                 cursor.close()
 
-                return {
-                    "total_mirrors": total,
-                    "avg_cleanliness": round(float(avg_cleanliness) * 100, 1) if avg_cleanliness else 0,
-                    "mirrors_need_cleaning": need_cleaning,
-                    "inspections_this_month": inspections,
-                    "last_inspection": last,
-                }
+                return self._dashboard_payload(total, avg_cleanliness, need_cleaning, inspections, last)
         except Exception as e:
             print(f"Error fetching dashboard stats: {e}")
             return {}
 
+    def rebuild_rollups(self, tables: Optional[List[str]] = None) -> Dict[str, int]:
+        """Recompute trigger-maintained tables (all by default) from inspection_records in one transaction."""
+        with self._connect() as conn:
+            return self.rebuild_rollups_on(conn, tables)
+
+    @staticmethod
+    def rebuild_rollups_on(conn, tables: Optional[List[str]] = None) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        cursor = conn.cursor()
+        try:
+            for table, insert in ROLLUP_REBUILD:
+                if tables is not None and table not in tables:
+                    continue
+                cursor.execute(f"DELETE FROM `{table}`")
+                cursor.execute(insert)
+                counts[table] = cursor.rowcount
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+        return counts
+
+    # ==================== Latest State ====================
+
+    def get_latest_states(self, zone: str = None) -> List[Dict]:
+        """Newest inspection per heliostat, ordered by heliostat id.
+
+        Reads ``heliostat_latest_state`` (mysql_migrate.py step 005), which
+        triggers keep current, instead of ranking inspection_records.
+        """
+        if zone:
+            query = f"""
+                SELECT {LATEST_STATE_COLUMNS}
+                FROM heliostat_latest_state ls
+                JOIN heliostat_info hi ON hi.`定日镜序号` = ls.heliostat_id
+                WHERE hi.`区号` = %s
+                ORDER BY ls.heliostat_id
+            """
+            params: tuple = (zone,)
+        else:
+            query = f"SELECT {LATEST_STATE_COLUMNS} FROM heliostat_latest_state ls ORDER BY ls.heliostat_id"
+            params = ()
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(query, params or None)
+                results = _iso_rows(cursor.fetchall())
+                cursor.close()
+                return results
+        except Exception as e:
+            print(f"Error fetching latest heliostat states: {e}")
+            return []
+
+    def get_latest_state(self, heliostat_id: int) -> Optional[Dict]:
+        """Newest inspection of one heliostat, or None if it was never inspected."""
+        query = f"SELECT {LATEST_STATE_COLUMNS} FROM heliostat_latest_state ls WHERE ls.heliostat_id = %s"
+        try:
+            with self._connect() as conn:
+                cursor = conn.cursor(dictionary=True)
+                cursor.execute(query, (heliostat_id,))
+                result = _iso_row(cursor.fetchone())
+                cursor.close()
+                return result
+        except Exception as e:
+            print(f"Error fetching latest heliostat state: {e}")
+            return None
+
     # ==================== Logs ====================
 
     def get_logs(self, limit: int = 50, log_type: str = None) -> List[Dict]:
@@ -375,7 +959,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, tuple(params))
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
@@ -397,7 +981,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query, (username, password))
-                result = cursor.fetchone()
+                result = _iso_row(cursor.fetchone())
                 cursor.close()
                 return result
         except Exception as e:
@@ -416,7 +1000,7 @@ class MySQLRepository:
             with self._connect() as conn:
                 cursor = conn.cursor(dictionary=True)
                 cursor.execute(query)
-                results = cursor.fetchall()
+                results = _iso_rows(cursor.fetchall())
                 cursor.close()
                 return results
         except Exception as e:
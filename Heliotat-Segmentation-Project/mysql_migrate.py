@@ -0,0 +1,525 @@
+"""solar_heliostat 的 MySQL 结构迁移：补齐主键与索引，并把文本类型的 `时间戳` 原地转换为 DATETIME。
+
+用法::
+
+    python mysql_migrate.py               # 执行所有尚未执行的迁移
+    python mysql_migrate.py --status      # 查看迁移状态
+    python mysql_migrate.py --batch-size 20000
+
+已执行的迁移记录在 ``schema_migrations`` 表中。MySQL 的 DDL 会隐式提交，因此每一步都
+写成可重复执行的形式：中途失败后修正数据再次运行，会跳过已经完成的部分继续执行。
+"""
+
+from __future__ import annotations
+
+import argparse
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from mysql_database import CLEANLINESS_TABLES, DASHBOARD_ROLLUP_TABLES, DIRTY_THRESHOLD, MySQLRepository
+
+Migration = Tuple[str, str, Callable[..., None]]
+
+
+def _columns(conn, table: str) -> Dict[str, str]:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    columns = {name: data_type.lower() for name, data_type in cursor.fetchall()}
+    cursor.close()
+    return columns
+
+
+def _indexes(conn, table: str) -> Set[str]:
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        """,
+        (table,),
+    )
+    names = {row[0] for row in cursor.fetchall()}
+    cursor.close()
+    return names
+
+
+def _execute(conn, sql: str, params: tuple = ()) -> int:
+    cursor = conn.cursor()
+    # No params means no %-formatting, so DATE_FORMAT patterns pass through untouched
+    cursor.execute(sql, params or None)
+    count = cursor.rowcount
+    cursor.close()
+    conn.commit()
+    return count
+
+
+def _add_primary_key(conn, table: str, column: str, auto_increment: bool = True) -> None:
+    if "PRIMARY" in _indexes(conn, table):
+        return
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT COUNT(*) - COUNT(DISTINCT `{column}`), SUM(`{column}` IS NULL) FROM `{table}`"
+    )
+    duplicates, nulls = cursor.fetchone()
+    cursor.close()
+    if duplicates or nulls:
+        raise RuntimeError(
+            f"{table}.{column} has {duplicates} duplicate and {nulls or 0} NULL values; "
+            "fix them before adding the primary key"
+        )
+    extra = " AUTO_INCREMENT" if auto_increment else ""
+    print(f"  {table}: PRIMARY KEY (`{column}`)")
+    _execute(conn, f"ALTER TABLE `{table}` MODIFY `{column}` INT NOT NULL{extra}, ADD PRIMARY KEY (`{column}`)")
+
+
+def _add_index(conn, table: str, name: str, columns: str) -> None:
+    if name in _indexes(conn, table):
+        return
+    print(f"  {table}: INDEX {name} ({columns})")
+    _execute(conn, f"ALTER TABLE `{table}` ADD INDEX `{name}` ({columns}), ALGORITHM=INPLACE, LOCK=NONE")
+
+
+def _convert_timestamp(conn, table: str, pk: str, after: str, batch_size: int, column: str = "时间戳") -> None:
+    """Rewrite an ISO text column as DATETIME(6) through a shadow column, ``batch_size`` rows per commit."""
+    columns = _columns(conn, table)
+    if columns.get(column) == "datetime":
+        return
+    shadow = f"{column}_dt"
+    if shadow not in columns:
+        _execute(conn, f"ALTER TABLE `{table}` ADD COLUMN `{shadow}` DATETIME(6) NULL")
+
+    cursor = conn.cursor()
+    cursor.execute(f"SELECT MIN(`{pk}`), MAX(`{pk}`) FROM `{table}`")
+    low, high = cursor.fetchone()
+    cursor.close()
+    converted = 0
+    if low is not None:
+        for start in range(low, high + 1, batch_size):
+            # 'T' separators and fractional seconds both parse; IGNORE leaves bad values NULL for the check below
+            converted += _execute(
+                conn,
+                f"""
+                UPDATE IGNORE `{table}`
+                SET `{shadow}` = CAST(REPLACE(`{column}`, 'T', ' ') AS DATETIME(6))
+                WHERE `{pk}` BETWEEN %s AND %s
+                  AND `{shadow}` IS NULL AND `{column}` IS NOT NULL AND `{column}` != ''
+                """,
+                (start, start + batch_size - 1),
+            )
+            print(f"  {table}: {converted} timestamps converted (up to {pk}={min(high, start + batch_size - 1)})")
+
+    cursor = conn.cursor()
+    cursor.execute(
+        f"""
+        SELECT `{pk}`, `{column}` FROM `{table}`
+        WHERE `{shadow}` IS NULL AND `{column}` IS NOT NULL AND `{column}` != ''
+        LIMIT 5
+        """
+    )
+    bad = cursor.fetchall()
+    cursor.close()
+    if bad:
+        raise RuntimeError(f"{table}.{column} has values that are not timestamps, e.g. {bad}; fix and re-run")
+    _execute(
+        conn,
+        f"ALTER TABLE `{table}` DROP COLUMN `{column}`, "
+        f"CHANGE COLUMN `{shadow}` `{column}` DATETIME(6) NULL AFTER `{after}`",
+    )
+
+
+def _m001_primary_keys(conn, batch_size: int) -> None:
+    _add_primary_key(conn, "inspection_records", "检查序号")
+    _add_primary_key(conn, "heliostat_info", "定日镜序号", auto_increment=False)
+    _add_primary_key(conn, "flight_records", "飞行记录序号")
+    _add_primary_key(conn, "logs", "处理序号")
+
+
+def _m002_datetime_timestamps(conn, batch_size: int) -> None:
+    # AFTER keeps the column position, so positional INSERTs from the dump still work
+    _convert_timestamp(conn, "inspection_records", "检查序号", "置信度", batch_size)
+    _convert_timestamp(conn, "flight_records", "飞行记录序号", "飞行记录文件地址", batch_size)
+    _convert_timestamp(conn, "logs", "处理序号", "操作详情", batch_size)
+
+
+def _m003_indexes(conn, batch_size: int) -> None:
+    if _columns(conn, "heliostat_info").get("区号") != "varchar":
+        _execute(conn, "ALTER TABLE `heliostat_info` MODIFY `区号` VARCHAR(16)")
+    _add_index(conn, "heliostat_info", "idx_zone", "`区号`")
+    _add_index(conn, "inspection_records", "idx_heliostat_time", "`定日镜序号`, `时间戳`")
+    _add_index(conn, "inspection_records", "idx_flight", "`飞行记录序号`")
+    _add_index(conn, "inspection_records", "idx_time", "`时间戳`")
+    _add_index(conn, "flight_records", "idx_time", "`时间戳`")
+    _add_index(conn, "logs", "idx_time", "`时间戳`")
+
+
+def _create_trigger(conn, name: str, timing: str, body: str) -> None:
+    _execute(conn, f"DROP TRIGGER IF EXISTS `{name}`")
+    _execute(conn, f"CREATE TRIGGER `{name}` {timing} ON inspection_records FOR EACH ROW {body}")
+
+
+def _m004_dashboard_rollups(conn, batch_size: int) -> None:
+    """Rollup tables behind get_dashboard_stats, maintained by triggers on inspection_records.
+
+    Every insert/update/delete adds or subtracts its row through one stored
+    procedure, so the three triggers cannot drift apart.
+    """
+    _execute(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS inspection_daily_stats (
+            day DATE PRIMARY KEY,
+            inspection_count INT NOT NULL DEFAULT 0,
+            cleanliness_sum DOUBLE NOT NULL DEFAULT 0,
+            cleanliness_count INT NOT NULL DEFAULT 0
+        )
+        """,
+    )
+    _execute(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS inspection_daily_dirty (
+            day DATE NOT NULL,
+            heliostat_id INT NOT NULL,
+            dirty_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, heliostat_id)
+        )
+        """,
+    )
+    _execute(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS inspection_monthly_flights (
+            month DATE NOT NULL,
+            flight_id INT NOT NULL,
+            inspection_count INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (month, flight_id)
+        )
+        """,
+    )
+    _execute(conn, "DROP PROCEDURE IF EXISTS inspection_rollup_apply")
+    _execute(
+        conn,
+        f"""
+        CREATE PROCEDURE inspection_rollup_apply(
+            IN p_ts DATETIME(6), IN p_cleanliness DOUBLE, IN p_heliostat INT, IN p_flight INT, IN p_sign INT
+        )
+        BEGIN
+            IF p_ts IS NOT NULL THEN
+                INSERT INTO inspection_daily_stats (day, inspection_count, cleanliness_sum, cleanliness_count)
+                VALUES (DATE(p_ts), p_sign, p_sign * IFNULL(p_cleanliness, 0), p_sign * (p_cleanliness IS NOT NULL))
+                ON DUPLICATE KEY UPDATE
+                    inspection_count = inspection_count + p_sign,
+                    cleanliness_sum = cleanliness_sum + p_sign * IFNULL(p_cleanliness, 0),
+                    cleanliness_count = cleanliness_count + p_sign * (p_cleanliness IS NOT NULL);
+                IF p_heliostat IS NOT NULL AND p_cleanliness < {DIRTY_THRESHOLD} THEN
+                    INSERT INTO inspection_daily_dirty (day, heliostat_id, dirty_count)
+                    VALUES (DATE(p_ts), p_heliostat, p_sign)
+                    ON DUPLICATE KEY UPDATE dirty_count = dirty_count + p_sign;
+                END IF;
+                IF p_flight IS NOT NULL THEN
+                    INSERT INTO inspection_monthly_flights (month, flight_id, inspection_count)
+                    VALUES (DATE_FORMAT(p_ts, '%Y-%m-01'), p_flight, p_sign)
+                    ON DUPLICATE KEY UPDATE inspection_count = inspection_count + p_sign;
+                END IF;
+            END IF;
+        END
+        """,
+    )
+    new_args = "NEW.`时间戳`, NEW.`清洁度分析值`, NEW.`定日镜序号`, NEW.`飞行记录序号`"
+    old_args = "OLD.`时间戳`, OLD.`清洁度分析值`, OLD.`定日镜序号`, OLD.`飞行记录序号`"
+    _create_trigger(conn, "trg_inspection_rollup_insert", "AFTER INSERT", f"CALL inspection_rollup_apply({new_args}, 1)")
+    _create_trigger(conn, "trg_inspection_rollup_delete", "AFTER DELETE", f"CALL inspection_rollup_apply({old_args}, -1)")
+    _create_trigger(
+        conn,
+        "trg_inspection_rollup_update",
+        "AFTER UPDATE",
+        f"BEGIN CALL inspection_rollup_apply({old_args}, -1); CALL inspection_rollup_apply({new_args}, 1); END",
+    )
+    # Triggers first, then the rebuild: its DELETE + INSERT ... SELECT runs in one
+    # transaction, so rows written meanwhile are neither lost nor counted twice.
+    MySQLRepository.rebuild_rollups_on(conn, DASHBOARD_ROLLUP_TABLES)
+
+
+def _m005_latest_state(conn, batch_size: int) -> None:
+    """``heliostat_latest_state``: the newest inspection of every heliostat, kept current by triggers.
+
+    "Newest" is the highest (时间戳, 检查序号). Inserts upsert the row; deleting
+    or updating the inspection a row points at re-reads that heliostat's
+    newest inspection through idx_heliostat_time.
+    """
+    _execute(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS heliostat_latest_state (
+            heliostat_id INT PRIMARY KEY,
+            inspection_id INT NOT NULL,
+            cleanliness DOUBLE NULL,
+            confidence DOUBLE NULL,
+            inspected_at DATETIME(6) NOT NULL,
+            flight_id INT NULL
+        )
+        """,
+    )
+    _execute(conn, "DROP PROCEDURE IF EXISTS heliostat_latest_upsert")
+    # INSERT IGNORE creates (and locks) the row first, so two concurrent inserts
+    # for a new heliostat serialise on it and the newer one still wins.
+    _execute(
+        conn,
+        """
+        CREATE PROCEDURE heliostat_latest_upsert(
+            IN p_heliostat INT, IN p_inspection INT, IN p_cleanliness DOUBLE,
+            IN p_confidence DOUBLE, IN p_ts DATETIME(6), IN p_flight INT
+        )
+        BEGIN
+            IF p_heliostat IS NOT NULL AND p_ts IS NOT NULL THEN
+                INSERT IGNORE INTO heliostat_latest_state
+                    (heliostat_id, inspection_id, cleanliness, confidence, inspected_at, flight_id)
+                VALUES (p_heliostat, p_inspection, p_cleanliness, p_confidence, p_ts, p_flight);
+                UPDATE heliostat_latest_state
+                SET inspection_id = p_inspection, cleanliness = p_cleanliness, confidence = p_confidence,
+                    inspected_at = p_ts, flight_id = p_flight
+                WHERE heliostat_id = p_heliostat AND (inspected_at, inspection_id) < (p_ts, p_inspection);
+            END IF;
+        END
+        """,
+    )
+    _execute(conn, "DROP PROCEDURE IF EXISTS heliostat_latest_refresh")
+    _execute(
+        conn,
+        """
+        CREATE PROCEDURE heliostat_latest_refresh(IN p_heliostat INT, IN p_inspection INT)
+        BEGIN
+            IF EXISTS (
+                SELECT 1 FROM heliostat_latest_state
+                WHERE heliostat_id = p_heliostat AND inspection_id = p_inspection
+            ) THEN
+                DELETE FROM heliostat_latest_state WHERE heliostat_id = p_heliostat;
+                INSERT INTO heliostat_latest_state
+                    (heliostat_id, inspection_id, cleanliness, confidence, inspected_at, flight_id)
+                SELECT `定日镜序号`, `检查序号`, `清洁度分析值`, `置信度`, `时间戳`, `飞行记录序号`
+                FROM inspection_records
+                WHERE `定日镜序号` = p_heliostat AND `时间戳` IS NOT NULL
+                ORDER BY `时间戳` DESC, `检查序号` DESC
+                LIMIT 1;
+            END IF;
+        END
+        """,
+    )
+    new_args = "NEW.`定日镜序号`, NEW.`检查序号`, NEW.`清洁度分析值`, NEW.`置信度`, NEW.`时间戳`, NEW.`飞行记录序号`"
+    _create_trigger(conn, "trg_latest_state_insert", "AFTER INSERT", f"CALL heliostat_latest_upsert({new_args})")
+    _create_trigger(
+        conn,
+        "trg_latest_state_delete",
+        "AFTER DELETE",
+        "CALL heliostat_latest_refresh(OLD.`定日镜序号`, OLD.`检查序号`)",
+    )
+    # Refresh first: the updated row may have been the newest and no longer be
+    _create_trigger(
+        conn,
+        "trg_latest_state_update",
+        "AFTER UPDATE",
+        f"BEGIN CALL heliostat_latest_refresh(OLD.`定日镜序号`, OLD.`检查序号`); "
+        f"CALL heliostat_latest_upsert({new_args}); END",
+    )
+    MySQLRepository.rebuild_rollups_on(conn, ["heliostat_latest_state"])
+
+
+def _cleanliness_bucket_procedure(conn, table: str, bucket_type: str, bucket: str, unit: str) -> None:
+    """``<table>_apply(ts, zone, value, sign)``: add or remove one value from its bucket.
+
+    Count and sum are adjusted in place. Min/max cannot be decremented, so
+    removing a value equal to the bucket's min or max re-reads that one
+    bucket (a day or an hour) from inspection_records through idx_time.
+    """
+    _execute(conn, f"DROP PROCEDURE IF EXISTS {table}_apply")
+    _execute(
+        conn,
+        f"""
+        CREATE PROCEDURE {table}_apply(IN p_ts DATETIME(6), IN p_zone VARCHAR(16), IN p_value DOUBLE, IN p_sign INT)
+        BEGIN
+            DECLARE v_bucket {bucket_type} DEFAULT {bucket};
+            DECLARE v_min DOUBLE DEFAULT NULL;
+            DECLARE v_max DOUBLE DEFAULT NULL;
+            IF p_sign > 0 THEN
+                INSERT INTO {table}
+                    (bucket, zone, sample_count, cleanliness_sum, cleanliness_min, cleanliness_max)
+                VALUES (v_bucket, p_zone, 1, p_value, p_value, p_value)
+                ON DUPLICATE KEY UPDATE
+                    sample_count = sample_count + 1,
+                    cleanliness_sum = cleanliness_sum + p_value,
+                    cleanliness_min = LEAST(IFNULL(cleanliness_min, p_value), p_value),
+                    cleanliness_max = GREATEST(IFNULL(cleanliness_max, p_value), p_value);
+            ELSE
+                SELECT cleanliness_min, cleanliness_max INTO v_min, v_max
+                FROM {table} WHERE zone = p_zone AND bucket = v_bucket FOR UPDATE;
+                UPDATE {table}
+                SET sample_count = sample_count - 1, cleanliness_sum = cleanliness_sum - p_value
+                WHERE zone = p_zone AND bucket = v_bucket;
+                IF p_value <= v_min OR p_value >= v_max THEN
+                    SELECT MIN(ir.`清洁度分析值`), MAX(ir.`清洁度分析值`) INTO v_min, v_max
+                    FROM inspection_records ir
+                    LEFT JOIN heliostat_info hi ON hi.`定日镜序号` = ir.`定日镜序号`
+                    WHERE ir.`时间戳` >= v_bucket AND ir.`时间戳` < v_bucket + INTERVAL 1 {unit}
+                      AND (p_zone = '*' OR hi.`区号` = p_zone);
+                    UPDATE {table} SET cleanliness_min = v_min, cleanliness_max = v_max
+                    WHERE zone = p_zone AND bucket = v_bucket;
+                END IF;
+            END IF;
+        END
+        """,
+    )
+
+
+def _m006_cleanliness_rollups(conn, batch_size: int) -> None:
+    """Daily and hourly cleanliness avg/min/max/count per zone and for the whole field (zone '*').
+
+    Maintained by triggers like step 004, so /api/cleanliness/history reads
+    one primary-key range of a rollup table for any number of days.
+    """
+    buckets = {
+        "day": ("DATE", "DATE(p_ts)", "DAY"),
+        "hour": ("DATETIME", "DATE_FORMAT(p_ts, '%Y-%m-%d %H:00:00')", "HOUR"),
+    }
+    for granularity, table in CLEANLINESS_TABLES.items():
+        bucket_type, bucket, unit = buckets[granularity]
+        _execute(
+            conn,
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                zone VARCHAR(16) NOT NULL,
+                bucket {bucket_type} NOT NULL,
+                sample_count INT NOT NULL DEFAULT 0,
+                cleanliness_sum DOUBLE NOT NULL DEFAULT 0,
+                cleanliness_min DOUBLE NULL,
+                cleanliness_max DOUBLE NULL,
+                PRIMARY KEY (zone, bucket)
+            )
+            """,
+        )
+        _cleanliness_bucket_procedure(conn, table, bucket_type, bucket, unit)
+
+    _execute(conn, "DROP PROCEDURE IF EXISTS cleanliness_rollup_apply")
+    calls = "".join(
+        f"CALL {table}_apply(p_ts, '*', p_cleanliness, p_sign); "
+        f"IF v_zone IS NOT NULL THEN CALL {table}_apply(p_ts, v_zone, p_cleanliness, p_sign); END IF;"
+        for table in CLEANLINESS_TABLES.values()
+    )
+    _execute(
+        conn,
+        f"""
+        CREATE PROCEDURE cleanliness_rollup_apply(
+            IN p_ts DATETIME(6), IN p_cleanliness DOUBLE, IN p_heliostat INT, IN p_sign INT
+        )
+        BEGIN
+            DECLARE v_zone VARCHAR(16) DEFAULT NULL;
+            IF p_ts IS NOT NULL AND p_cleanliness IS NOT NULL THEN
+                IF p_heliostat IS NOT NULL THEN
+                    SELECT `区号` INTO v_zone FROM heliostat_info WHERE `定日镜序号` = p_heliostat;
+                END IF;
+                {calls}
+            END IF;
+        END
+        """,
+    )
+    new_args = "NEW.`时间戳`, NEW.`清洁度分析值`, NEW.`定日镜序号`"
+    old_args = "OLD.`时间戳`, OLD.`清洁度分析值`, OLD.`定日镜序号`"
+    _create_trigger(conn, "trg_cleanliness_rollup_insert", "AFTER INSERT", f"CALL cleanliness_rollup_apply({new_args}, 1)")
+    _create_trigger(conn, "trg_cleanliness_rollup_delete", "AFTER DELETE", f"CALL cleanliness_rollup_apply({old_args}, -1)")
+    _create_trigger(
+        conn,
+        "trg_cleanliness_rollup_update",
+        "AFTER UPDATE",
+        f"BEGIN CALL cleanliness_rollup_apply({old_args}, -1); CALL cleanliness_rollup_apply({new_args}, 1); END",
+    )
+    MySQLRepository.rebuild_rollups_on(conn, list(CLEANLINESS_TABLES.values()))
+
+
+# Append new steps; never edit one that has shipped.
+MIGRATIONS: List[Migration] = [
+    ("001", "primary keys on all data tables", _m001_primary_keys),
+    ("002", "时间戳 TEXT -> DATETIME(6)", _m002_datetime_timestamps),
+    ("003", "indexes for heliostat / flight / time lookups", _m003_indexes),
+    ("004", "dashboard rollup tables and triggers", _m004_dashboard_rollups),
+    ("005", "heliostat_latest_state table and triggers", _m005_latest_state),
+    ("006", "daily/hourly cleanliness rollups per zone", _m006_cleanliness_rollups),
+]
+
+
+def _ensure_migrations_table(conn) -> None:
+    _execute(
+        conn,
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version VARCHAR(32) PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    )
+
+
+def applied_versions(conn) -> Dict[str, str]:
+    _ensure_migrations_table(conn)
+    cursor = conn.cursor()
+    cursor.execute("SELECT version, applied_at FROM schema_migrations")
+    applied = {version: str(applied_at) for version, applied_at in cursor.fetchall()}
+    cursor.close()
+    return applied
+
+
+def migrate(repository: MySQLRepository, batch_size: int = 5000, target: Optional[str] = None) -> List[str]:
+    """Apply pending migrations in order (up to ``target``); returns the versions applied."""
+    done: List[str] = []
+    with repository._connect() as conn:
+        applied = applied_versions(conn)
+        for version, description, step in MIGRATIONS:
+            if version in applied:
+                continue
+            if target is not None and version > target:
+                break
+            print(f"→ {version}: {description}")
+            step(conn, batch_size)
+            _execute(
+                conn,
+                "INSERT INTO schema_migrations (version, description) VALUES (%s, %s)",
+                (version, description),
+            )
+            done.append(version)
+    return done
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Migrate the solar_heliostat MySQL schema")
+    parser.add_argument("--status", action="store_true", help="list migrations and exit")
+    parser.add_argument("--batch-size", type=int, default=5000, help="rows per UPDATE when converting timestamps")
+    parser.add_argument("--target", help="stop after this version")
+    parser.add_argument(
+        "--rebuild-rollups",
+        action="store_true",
+        help="recompute the rollup and latest-state tables from inspection_records",
+    )
+    args = parser.parse_args()
+
+    repository = MySQLRepository(pool_size=1)
+    if args.rebuild_rollups:
+        for table, rows in repository.rebuild_rollups().items():
+            print(f"✓ {table}: {rows} rows")
+        return
+    if args.status:
+        with repository._connect() as conn:
+            applied = applied_versions(conn)
+        for version, description, _ in MIGRATIONS:
+            state = f"applied {applied[version]}" if version in applied else "pending"
+            print(f"{version}  {description:<50} {state}")
+        return
+    done = migrate(repository, batch_size=max(1, args.batch_size), target=args.target)
+    print(f"✓ {len(done)} migration(s) applied" if done else "✓ Schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
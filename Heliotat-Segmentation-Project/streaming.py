@@ -0,0 +1,89 @@
+"""流式响应工具：把逐行产生的记录编码为 JSON / NDJSON / CSV 文本块，并可选 gzip 压缩。
+
+所有函数都只持有一个分块的数据，导出大小不再受内存限制。
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+import json
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+STREAM_FORMATS = ("json", "ndjson", "csv")
+
+MIMETYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def chunked(records: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk: List[Dict] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=str)
+
+
+def json_stream(
+    records: Iterable[Dict], key: str = "results", chunk_rows: int = 500, head: Optional[Dict] = None
+) -> Iterator[str]:
+    """``{**head, "<key>": [...], "total": N}`` written incrementally; ``total`` comes last."""
+    prefix = "".join(f"{json.dumps(name)}: {_dumps(value)}, " for name, value in (head or {}).items())
+    yield f'{{{prefix}"{key}": ['
+    total = 0
+    for chunk in chunked(records, chunk_rows):
+        prefix = "," if total else ""
+        total += len(chunk)
+        yield prefix + ",".join(_dumps(record) for record in chunk)
+    yield f'], "total": {total}}}'
+
+
+def ndjson_stream(records: Iterable[Dict], chunk_rows: int = 500) -> Iterator[str]:
+    for chunk in chunked(records, chunk_rows):
+        yield "".join(_dumps(record) + "\n" for record in chunk)
+
+
+def csv_stream(records: Iterable[Dict], fieldnames: Sequence[str], chunk_rows: int = 500) -> Iterator[str]:
+    # Leading BOM so Excel opens UTF-8 (Chinese) filenames correctly
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fieldnames, extrasaction="ignore")
+    writer.writeheader()
+    yield "\ufeff" + buffer.getvalue()
+    for chunk in chunked(records, chunk_rows):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(chunk)
+        yield buffer.getvalue()
+
+
+def encode_stream(
+    records: Iterable[Dict], fmt: str, fieldnames: Sequence[str], key: str = "results", head: Optional[Dict] = None
+) -> Iterator[str]:
+    if fmt == "csv":
+        return csv_stream(records, fieldnames)
+    if fmt == "ndjson":
+        return ndjson_stream(records)
+    if fmt == "json":
+        return json_stream(records, key=key, head=head)
+    raise ValueError(f"unsupported format: {fmt}")
+
+
+def gzip_stream(chunks: Iterable[str], level: int = 6) -> Iterator[bytes]:
+    """Gzip text chunks, flushing after each so the client sees data immediately."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8")) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
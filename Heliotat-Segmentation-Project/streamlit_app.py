@@ -3,9 +3,9 @@
 from __future__ import annotations
 
 import os
-from base64 import b64decode
 from io import BytesIO
-from typing import Dict, List
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin
 
 import pandas as pd
 import requests
@@ -28,13 +28,23 @@ def classify_image(file) -> Dict[str, object]:
     return response.json()
 
 
-def fetch_history(search: str, limit: int) -> List[Dict[str, object]]:
+def fetch_annotated_image(annotated_url: str) -> bytes:
+    response = requests.get(urljoin(API_BASE_URL, annotated_url), timeout=30)
+    response.raise_for_status()
+    return response.content
+
+
+def fetch_history(
+    search: str, limit: int, cursor: Optional[str] = None
+) -> Tuple[List[Dict[str, object]], Optional[str]]:
     params = {"limit": limit}
     if search:
         params["search"] = search
+    if cursor:
+        params["cursor"] = cursor
     response = requests.get(f"{API_BASE_URL}/history", params=params, timeout=15)
     data = response.json()
-    return data.get("results", [])
+    return data.get("results", []), data.get("next_cursor")
 
 
 def main() -> None:
@@ -68,9 +78,9 @@ def main() -> None:
                             det_df = det_df.drop(columns=["center"])
                             st.dataframe(det_df, width="stretch")
 
-                        annotated_b64 = result.get("annotated_image")
-                        if annotated_b64:
-                            annotated_bytes = b64decode(annotated_b64)
+                        annotated_url = result.get("annotated_url")
+                        if annotated_url:
+                            annotated_bytes = fetch_annotated_image(annotated_url)
                             annotated_img = Image.open(BytesIO(annotated_bytes))
                             st.image(annotated_img, caption="分割结果", width="stretch")
 
@@ -80,11 +90,22 @@ def main() -> None:
     limit = st.slider("返回记录条数", min_value=10, max_value=100, value=30, step=10)
     if "history" not in st.session_state:
         st.session_state.history = []
+        st.session_state.history_cursor = None
 
     if st.button("刷新历史记录"):
         with st.spinner("加载历史记录..."):
             try:
-                st.session_state.history = fetch_history(search, limit)
+                st.session_state.history, st.session_state.history_cursor = fetch_history(search, limit)
+            except requests.RequestException as exc:  # noqa: PERF203
+                st.error(f"获取历史记录失败: {exc}")
+
+    if st.session_state.history_cursor and st.button("加载更多"):
+        with st.spinner("加载历史记录..."):
+            try:
+                more, st.session_state.history_cursor = fetch_history(
+                    search, limit, st.session_state.history_cursor
+                )
+                st.session_state.history = st.session_state.history + more
             except requests.RequestException as exc:  # noqa: PERF203
                 st.error(f"获取历史记录失败: {exc}")
 
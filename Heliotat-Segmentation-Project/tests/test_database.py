@@ -0,0 +1,155 @@
+"""Schema migration and history paging of ``database.ResultRepository``."""
+
+import sqlite3
+
+import pytest
+
+from database import SCHEMA_VERSION, ResultRepository, decode_cursor, encode_cursor
+
+# The original flat table (before file_hash and annotated_image were added)
+LEGACY_SCHEMA = """
+    CREATE TABLE detection_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        target TEXT NOT NULL,
+        center_x REAL NOT NULL,
+        center_y REAL NOT NULL,
+        confidence REAL NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+H1 = "a" * 32
+H2 = "b" * 32
+
+# (filename, target, center_x, center_y, confidence, file_hash, annotated_image, created_at)
+LEGACY_ROWS = [
+    # Written before hashing: one upload per (filename, created_at)
+    ("old.jpg", "dirty", 1.0, 2.0, 0.9, None, None, "2024-01-01 08:00:00"),
+    ("old.jpg", "clean", 3.0, 4.0, 0.8, None, None, "2024-01-01 08:00:00"),
+    ("old2.jpg", "dirty", 5.0, 6.0, 0.7, None, None, "2024-01-01 08:00:00"),
+    ("old.jpg", "dirty", 7.0, 8.0, 0.6, None, None, "2024-01-02 08:00:00"),
+    # Hashed rows, with the annotated image inlined on every detection
+    ("a.jpg", "dirty", 10.0, 20.0, 0.95, H1, "QUJD", "2024-03-01 10:00:00"),
+    ("a.jpg", "clean", 30.0, 40.0, 0.85, H1, "QUJD", "2024-03-01 10:00:00"),
+    # Sentinel row of an image without detections
+    ("DJI_20240315_Z03_0012.jpg", "none", -1.0, -1.0, 0.0, H2, None, "2024-03-15 09:00:00"),
+]
+
+
+@pytest.fixture
+def legacy_db(tmp_path):
+    path = tmp_path / "results.db"
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    conn.executemany(
+        "INSERT INTO detection_results (filename, target, center_x, center_y, confidence, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?)",
+        [row[:5] + row[7:] for row in LEGACY_ROWS if row[5] is None],
+    )
+    conn.execute("ALTER TABLE detection_results ADD COLUMN file_hash TEXT")
+    conn.execute("ALTER TABLE detection_results ADD COLUMN annotated_image TEXT")
+    conn.executemany(
+        "INSERT INTO detection_results "
+        "(filename, target, center_x, center_y, confidence, file_hash, annotated_image, created_at) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [row for row in LEGACY_ROWS if row[5] is not None],
+    )
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _count(repo, table):
+    return repo._connect().execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def _page_all(repo, limit, search=None):
+    rows, cursor = repo.fetch_page(limit=limit, search=search)
+    pages = [rows]
+    while cursor is not None:
+        rows, cursor = repo.fetch_page(limit=limit, search=search, cursor=cursor)
+        pages.append(rows)
+    return [tuple(row) for page in pages for row in page]
+
+
+def test_migration_converts_legacy_rows(legacy_db):
+    repo = ResultRepository(legacy_db)
+    conn = repo._connect()
+
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+    assert conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'detection_results'").fetchone() is None
+    # H1, H2, old.jpg and old2.jpg on 01-01, old.jpg on 01-02
+    assert _count(repo, "images") == 5
+    assert _count(repo, "detections") == 6
+    assert [tuple(row) for row in conn.execute("SELECT * FROM legacy_annotated_images")] == [(H1, "QUJD")]
+
+    by_hash = repo.get_results_by_hash(H1)
+    assert [(row["filename"], row["target"]) for row in by_hash] == [("a.jpg", "dirty"), ("a.jpg", "clean")]
+    sentinel = repo.get_results_by_hash(H2)
+    assert [(row["target"], row["center_x"], row["confidence"]) for row in sentinel] == [("none", -1.0, 0.0)]
+
+    # Re-opening an up-to-date database runs no step
+    ResultRepository(legacy_db)
+    assert _count(repo, "images") == 5
+
+
+def test_migration_of_unhashed_table(tmp_path):
+    path = tmp_path / "results.db"
+    conn = sqlite3.connect(path)
+    conn.execute(LEGACY_SCHEMA)
+    conn.execute(
+        "INSERT INTO detection_results (filename, target, center_x, center_y, confidence) "
+        "VALUES ('x.jpg', 'dirty', 1, 2, 0.5)"
+    )
+    conn.commit()
+    conn.close()
+
+    repo = ResultRepository(path)
+    assert _count(repo, "images") == 1
+    assert [row["target"] for row in repo.fetch_results()] == ["dirty"]
+
+
+def test_history_order_and_cursor_paging(legacy_db):
+    repo = ResultRepository(legacy_db)
+    full = _page_all(repo, limit=100)
+
+    assert len(full) == 7
+    assert [row[2] for row in full] == [
+        "DJI_20240315_Z03_0012.jpg",
+        "a.jpg",
+        "a.jpg",
+        "old.jpg",
+        "old2.jpg",
+        "old.jpg",
+        "old.jpg",
+    ]
+    # Images sharing a timestamp come newest id first, detections in insertion order
+    assert [row[3] for row in full[4:]] == ["dirty", "dirty", "clean"]
+    for limit in range(1, 8):
+        assert _page_all(repo, limit) == full
+
+
+def test_cursor_round_trip(legacy_db):
+    repo = ResultRepository(legacy_db)
+    rows, cursor = repo.fetch_page(limit=2)
+    assert decode_cursor(cursor) == (rows[1]["created_at"], rows[1]["image_id"], rows[1]["detection_id"])
+    assert decode_cursor(encode_cursor(rows[0])) == (
+        rows[0]["created_at"], rows[0]["image_id"], rows[0]["detection_id"]
+    )
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_search_after_migration(legacy_db):
+    repo = ResultRepository(legacy_db)
+    if not repo.has_fts:
+        pytest.skip("SQLite built without FTS5")
+    assert [row[2] for row in _page_all(repo, 2, search="Z03 202403")] == ["DJI_20240315_Z03_0012.jpg"]
+    # The last token of a term is a prefix
+    assert {row[2] for row in _page_all(repo, 2, search="old")} == {"old.jpg", "old2.jpg"}
+
+    # New images are indexed by the FTS triggers and sort first
+    repo.insert_batch([("DJI_20250101_Z07_0001.jpg", "c" * 32, [])])
+    assert [row[2] for row in _page_all(repo, 1, search="Z07")] == ["DJI_20250101_Z07_0001.jpg"]
+    assert repo.fetch_results(limit=1)[0]["filename"] == "DJI_20250101_Z07_0001.jpg"
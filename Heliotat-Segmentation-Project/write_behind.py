@@ -0,0 +1,188 @@
+"""写后队列：推理结果先放入内存队列立即返回，由后台线程分批写入 SQLite。
+
+崩溃窗口：进程被 SIGKILL 或断电时，尚未落盘的结果（最多 ``max_size`` 张图片，
+正常负载下约 ``max_delay`` 秒内的结果）会丢失；标注 PNG 已单独写盘不受影响，
+丢失的只是历史记录，同一图片再次上传会重新推理。正常退出（SIGTERM）时会先清空队列。
+写入持续失败（磁盘已满、数据库损坏等）时，每批最多重试 ``max_retries`` 次后丢弃并计入 ``dropped``；
+队列满时 ``submit`` 最多等待 ``submit_timeout`` 秒，之后在请求线程中直接写入，不会无限阻塞。
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from database import ResultRepository
+
+# (filename, file_hash, detections) as taken by ResultRepository.insert_batch
+Item = Tuple[str, str, Sequence[Dict[str, object]]]
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    """Bounded queue drained by one writer thread in ``insert_batch`` transactions.
+
+    ``submit`` waits up to ``submit_timeout`` once ``max_size`` results are
+    waiting, which pushes back on uploads instead of growing memory, and then
+    writes the result inline. Results stay visible through ``pending`` until
+    they are committed, so the hash cache never misses an image that is still
+    in the queue. A batch that still fails after ``max_retries`` attempts is
+    dropped and counted in ``dropped``/``last_error``.
+    """
+
+    def __init__(
+        self,
+        repository: ResultRepository,
+        max_size: int = 1000,
+        batch_size: int = 200,
+        max_delay: float = 0.2,
+        retry_interval: float = 1.0,
+        max_retries: int = 5,
+        submit_timeout: float = 5.0,
+    ):
+        self.repository = repository
+        self.max_size = max(1, max_size)
+        self.batch_size = max(1, batch_size)
+        self.max_delay = max_delay
+        self.retry_interval = retry_interval
+        self.max_retries = max(1, max_retries)
+        self.submit_timeout = submit_timeout
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=self.max_size)
+        self._pending: Dict[str, Item] = {}
+        self._lock = threading.Lock()
+        self._closing = False
+        self._written = 0
+        self._batches = 0
+        self._errors = 0
+        self._dropped = 0
+        self._inline_writes = 0
+        self._last_error: Optional[str] = None
+        self._last_batch_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def submit(self, filename: str, file_hash: str, detections: Sequence[Dict[str, object]]) -> None:
+        item: Item = (filename, file_hash, list(detections))
+        if self._closing or not self._thread.is_alive():
+            # Not running (or shutting down): fall back to a synchronous write
+            self.repository.insert_batch([item])
+            return
+        with self._lock:
+            if file_hash in self._pending:
+                return
+            self._pending[file_hash] = item
+        try:
+            self._queue.put(item, timeout=self.submit_timeout)
+        except queue.Full:
+            # The writer is stuck or far behind: write this one ourselves
+            with self._lock:
+                if self._pending.get(file_hash) is item:
+                    del self._pending[file_hash]
+                self._inline_writes += 1
+            self.repository.insert_batch([item])
+
+    def submit_many(self, items: Sequence[Item]) -> None:
+        for filename, file_hash, detections in items:
+            self.submit(filename, file_hash, detections)
+
+    def pending(self, file_hash: str) -> Optional[Item]:
+        """The queued, not yet committed result for ``file_hash``, if any."""
+        with self._lock:
+            return self._pending.get(file_hash)
+
+    def depth(self) -> int:
+        """Results not yet committed, including the batch being written."""
+        with self._lock:
+            return len(self._pending)
+
+    def metrics(self) -> Dict[str, object]:
+        return {
+            "depth": self.depth(),
+            "max_size": self.max_size,
+            "written": self._written,
+            "batches": self._batches,
+            "errors": self._errors,
+            "dropped": self._dropped,
+            "inline_writes": self._inline_writes,
+            "last_error": self._last_error,
+            "last_batch_ms": round(self._last_batch_ms, 2),
+        }
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything submitted so far is committed; False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._queue.all_tasks_done:
+            while self._queue.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._queue.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout: float = 30.0) -> None:
+        """Drain the queue and stop the writer; registered with ``atexit`` by the backend."""
+        if self._closing or not self._thread.is_alive():
+            return
+        self._closing = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        if self.depth():
+            print(f"✗ Write-behind queue closed with {self.depth()} results not written")
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            first = self._queue.get()
+            if first is _STOP:
+                self._queue.task_done()
+                break
+            batch: List[Item] = [first]  # type: ignore[list-item]
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    self._queue.task_done()
+                    stop = True
+                    break
+                batch.append(item)  # type: ignore[arg-type]
+            self._write(batch)
+        self.repository.close()
+
+    def _write(self, batch: List[Item]) -> None:
+        attempts = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                self.repository.insert_batch(batch)
+                self._last_batch_ms = (time.perf_counter() - start) * 1000
+                self._written += len(batch)
+                self._batches += 1
+                break
+            except Exception as exc:  # noqa: BLE001
+                attempts += 1
+                self._errors += 1
+                self._last_error = str(exc)
+                print(f"✗ Write-behind batch of {len(batch)} failed (attempt {attempts}): {exc}")
+                # Give up rather than let a persistent error (disk full, schema drift) fill the queue
+                if attempts >= self.max_retries:
+                    self._dropped += len(batch)
+                    print(f"✗ Write-behind dropped {len(batch)} results after {attempts} attempts")
+                    break
+                time.sleep(self.retry_interval)
+        with self._lock:
+            for item in batch:
+                if self._pending.get(item[1]) is item:
+                    del self._pending[item[1]]
+        for _ in batch:
+            self._queue.task_done()
@@ -54,7 +54,7 @@ After=network.target mysql.service
 User=root
 WorkingDirectory=/var/www/heliostat/backend
 Environment="PATH=/var/www/heliostat/backend/venv/bin"
-ExecStart=/var/www/heliostat/backend/venv/bin/gunicorn -w 2 -b 127.0.0.1:5000 --timeout 300 backend:app
+ExecStart=/var/www/heliostat/backend/venv/bin/gunicorn -w 2 --threads 4 -b 127.0.0.1:5000 --timeout 300 backend:app
 Restart=always
 RestartSec=5
 
@@ -21,6 +21,8 @@ const DetectionHistoryPage = () => {
   const [limit, setLimit] = useState(50);
   const [isExporting, setIsExporting] = useState(false);
   const [selectedRecord, setSelectedRecord] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   // Fetch history from backend
   const loadHistory = useCallback(async () => {
@@ -33,6 +35,7 @@ const DetectionHistoryPage = () => {
         search: searchTerm || undefined,
       });
       setRecords(result.results || []);
+      setNextCursor(result.next_cursor || null);
     } catch (err) {
       setError(err);
       toast.error(err.message || 'Failed to load history. Is the backend running?');
@@ -41,6 +44,25 @@ const DetectionHistoryPage = () => {
     }
   }, [limit, searchTerm, toast]);
 
+  // Append the next page after the current cursor
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const result = await fetchHistory({
+        limit,
+        search: searchTerm || undefined,
+        cursor: nextCursor,
+      });
+      setRecords((prev) => [...prev, ...(result.results || [])]);
+      setNextCursor(result.next_cursor || null);
+    } catch (err) {
+      toast.error(err.message || 'Failed to load more history.');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   // Initial load
   useEffect(() => {
     loadHistory();
@@ -259,6 +281,15 @@ const DetectionHistoryPage = () => {
                 <span className="text-slate-400 text-sm">
                   Showing {records.length} detection records
                 </span>
+                {nextCursor && (
+                  <button
+                    onClick={loadMore}
+                    disabled={loadingMore}
+                    className="px-3 py-1.5 bg-slate-800 hover:bg-slate-700 disabled:opacity-50 text-slate-300 text-sm rounded-lg transition-colors"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
                 <span className="text-slate-500 text-xs">
                   {summaryRecords.length} unique images
                 </span>
@@ -6,7 +6,7 @@
 import React, { useState, useRef, useCallback } from 'react';
 import { Upload, Camera, Image, Download, Loader2, CheckCircle, AlertTriangle, RefreshCw, Trash2, ZoomIn } from 'lucide-react';
 import { useToast } from './Toast';
-import { classifyImage } from '../services/api';
+import { classifyImage, getAnnotatedImageUrl } from '../services/api';
 
 const DetectionPage = () => {
   const toast = useToast();
@@ -116,15 +116,26 @@ const DetectionPage = () => {
     }
   };
 
+  const annotatedImageUrl = getAnnotatedImageUrl(result);
+
   // Download annotated image
-  const handleDownloadResult = () => {
-    if (!result?.annotated_image) return;
-
-    const link = document.createElement('a');
-    link.href = `data:image/png;base64,${result.annotated_image}`;
-    link.download = `detection_${selectedFile?.name || 'result'}.png`;
-    link.click();
-    toast.success('Image downloaded');
+  const handleDownloadResult = async () => {
+    if (!annotatedImageUrl) return;
+
+    try {
+      // Fetch as a blob so the download attribute also works cross-origin
+      const response = await fetch(annotatedImageUrl);
+      if (!response.ok) throw new Error(`HTTP error ${response.status}`);
+      const blobUrl = URL.createObjectURL(await response.blob());
+      const link = document.createElement('a');
+      link.href = blobUrl;
+      link.download = `detection_${selectedFile?.name || 'result'}.png`;
+      link.click();
+      URL.revokeObjectURL(blobUrl);
+      toast.success('Image downloaded');
+    } catch (err) {
+      toast.error(err.message || 'Download failed');
+    }
   };
 
   return (
@@ -243,7 +254,7 @@ const DetectionPage = () => {
               <CheckCircle size={20} className="text-emerald-400" />
               检测结果
             </h3>
-            {result?.annotated_image && (
+            {annotatedImageUrl && (
               <button
                 onClick={handleDownloadResult}
                 className="px-3 py-1.5 bg-slate-800 border border-slate-700 rounded-lg text-slate-300 text-sm hover:bg-slate-700 transition-all flex items-center gap-2"
@@ -257,10 +268,10 @@ const DetectionPage = () => {
           {result ? (
             <div className="space-y-4">
               {/* Annotated Image */}
-              {result.annotated_image && (
+              {annotatedImageUrl && (
                 <div className="relative bg-slate-950 rounded-xl overflow-hidden">
                   <img
-                    src={`data:image/png;base64,${result.annotated_image}`}
+                    src={annotatedImageUrl}
                     alt="Detection result"
                     className="w-full h-auto"
                   />
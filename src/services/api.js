@@ -92,7 +92,8 @@ export async function checkHealth() {
  * @typedef {Object} ClassificationResult
  * @property {string} filename - Original filename
  * @property {Detection[]} detections - Array of detected objects
- * @property {string} annotated_image - Base64-encoded annotated image
+ * @property {string} file_hash - MD5 hash of the uploaded image
+ * @property {string|null} annotated_url - Path of the annotated PNG (resolve with getAnnotatedImageUrl)
  * @property {boolean} cached - Whether result was from cache
  *
  * @typedef {Object} Detection
@@ -111,12 +112,23 @@ export async function classifyImage(imageFile, confidence = 0.25) {
   });
 }
 
+/**
+ * Resolve the annotated image URL returned by the classify endpoints
+ * @param {ClassificationResult} result - Classification result
+ * @returns {string|null} - Absolute image URL
+ */
+export function getAnnotatedImageUrl(result) {
+  if (!result?.annotated_url) return null;
+  return new URL(result.annotated_url, new URL(API_BASE_URL, window.location.origin)).toString();
+}
+
 /**
  * Fetch detection history
  * @param {Object} options - Query options
- * @param {number} options.limit - Max records to return (1-200, default 50)
- * @param {string} options.search - Filename search pattern (optional)
- * @returns {Promise<{results: HistoryRecord[]}>}
+ * @param {number} options.limit - Page size (1-200, default 50)
+ * @param {string} options.search - Filename tokens, prefix-matched (optional)
+ * @param {string} options.cursor - `next_cursor` of the previous page (optional)
+ * @returns {Promise<{results: HistoryRecord[], next_cursor: string|null}>}
  *
  * @typedef {Object} HistoryRecord
  * @property {string} time - Detection timestamp
@@ -126,19 +138,20 @@ export async function classifyImage(imageFile, confidence = 0.25) {
  * @property {number} center_y - Y coordinate
  * @property {number} confidence - Confidence score
  */
-export async function fetchHistory({ limit = 50, search = '' } = {}) {
+export async function fetchHistory({ limit = 50, search = '', cursor = '' } = {}) {
   const params = new URLSearchParams();
   if (limit) params.append('limit', limit);
   if (search) params.append('search', search);
+  if (cursor) params.append('cursor', cursor);
 
   const queryString = params.toString();
   return fetchAPI(`/history${queryString ? `?${queryString}` : ''}`);
 }
 
 /**
- * Fetch all detection history for export (no limit)
+ * Fetch all detection history for export (no limit; streamed by the backend)
  * @param {Object} options - Query options
- * @param {string} options.search - Filename search pattern (optional)
+ * @param {string} options.search - Filename tokens, prefix-matched (optional)
  * @returns {Promise<{results: HistoryRecord[], total: number}>}
  */
 export async function fetchHistoryForExport({ search = '' } = {}) {
@@ -324,6 +337,7 @@ export async function getMirrorFieldZones() {
 export const apiService = {
   checkHealth,
   classifyImage,
+  getAnnotatedImageUrl,
   fetchHistory,
   getMirrorImageUrl,
   getRandomImageUrl,
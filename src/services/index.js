@@ -2,5 +2,6 @@ export {
   apiService,
   checkHealth,
   classifyImage,
+  getAnnotatedImageUrl,
   fetchHistory,
 } from './api';
\ No newline at end of file
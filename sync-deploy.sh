@@ -22,6 +22,18 @@ cp -r "$PROJECT_DIR/dist/"* "$DEPLOY_DIR/frontend/"
 echo "3. Syncing backend..."
 cp "$PROJECT_DIR/Heliotat-Segmentation-Project/backend.py" "$DEPLOY_DIR/backend/"
 cp "$PROJECT_DIR/Heliotat-Segmentation-Project/database.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/batching.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/blob_store.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/inference.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/inference_server.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/jobs.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/compare_runtimes.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/streaming.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/columnar.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/maintenance.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/write_behind.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/mysql_migrate.py" "$DEPLOY_DIR/backend/"
+cp "$PROJECT_DIR/Heliotat-Segmentation-Project/cache.py" "$DEPLOY_DIR/backend/"
 cp "$PROJECT_DIR/Heliotat-Segmentation-Project/mirror_data.json" "$DEPLOY_DIR/backend/"
 cp "$PROJECT_DIR/Heliotat-Segmentation-Project/best.pt" "$DEPLOY_DIR/backend/" 2>/dev/null || true
 